@@ -0,0 +1,17 @@
+"""
+Gunicorn settings, read from the working directory when the container starts.
+
+SERVER_MODE=asgi (the default) runs uvicorn workers on success.asgi so a
+worker keeps serving other requests while LLM calls are in flight.
+SERVER_MODE=wsgi runs the classic sync workers on success.wsgi.
+"""
+import os
+
+bind = ':8000'
+workers = int(os.environ.get('GUNICORN_WORKERS', 2))
+
+if os.environ.get('SERVER_MODE', 'asgi') == 'wsgi':
+    wsgi_app = 'success.wsgi:application'
+else:
+    worker_class = 'uvicorn_worker.UvicornWorker'
+    wsgi_app = 'success.asgi:application'
@@ -1,94 +1,188 @@
+import asyncio
+import itertools
+import re
+import time
+from functools import partial
+
+from django.conf import settings
 from langchain_anthropic import ChatAnthropic
-from langchain.schema import HumanMessage, SystemMessage, AIMessage
-from .models import AssistantConversation, AssistantMessage
+from langchain.schema import HumanMessage, SystemMessage
+from . import copy_edit_cache
+from .assistant_context import build_context
+from .models import AssistantConversation, AssistantMessage, AssistantUsage
 
 llm = ChatAnthropic(model_name="claude-sonnet-4-20250514")
 copy_editor_llm = ChatAnthropic(model_name="claude-sonnet-4-20250514")
 
-def start_conversation(system, request):
+# Anthropic caches the prompt up to and including a block marked with this.
+# Prefixes shorter than the model's minimum (1024 tokens for Sonnet) are
+# simply not cached.
+CACHE_CONTROL = {"type": "ephemeral"}
+
+def cache_breakpoint(message):
+    """
+    Copy a message, marking it as the end of a cacheable prompt prefix
+    """
+    content = message.content
+    if isinstance(content, str):
+        content = [{"type": "text", "text": content}]
+    return message.__class__(content=content[:-1] + [{**content[-1], "cache_control": CACHE_CONTROL}])
+
+def _with_cached_prefix(messages, request):
+    """
+    Append the request to messages that will repeat on the next turn.
+
+    The system message and the end of the history both get a breakpoint,
+    so the next turn reads everything up to its new request from the cache.
+    """
+    messages = list(messages)
+    if messages and isinstance(messages[0], SystemMessage):
+        messages[0] = cache_breakpoint(messages[0])
+    if len(messages) > 1:
+        messages[-1] = cache_breakpoint(messages[-1])
+    return messages + [HumanMessage(content=request)]
+
+async def _record_usage(kind, model, response, started, conversation=None):
+    usage = response.usage_metadata or {}
+    details = usage.get('input_token_details') or {}
+    await AssistantUsage.objects.acreate(
+        kind=kind,
+        conversation=conversation,
+        model_name=getattr(model, 'model', ''),
+        input_tokens=usage.get('input_tokens', 0),
+        output_tokens=usage.get('output_tokens', 0),
+        cache_read_tokens=details.get('cache_read') or 0,
+        cache_creation_tokens=details.get('cache_creation') or 0,
+        duration_ms=round((time.perf_counter() - started) * 1000),
+    )
+
+async def _ainvoke(model, messages, kind, conversation=None):
+    """
+    Call the model and record its token usage, including prompt cache hits
+    """
+    started = time.perf_counter()
+    response = await model.ainvoke(messages)
+    await _record_usage(kind, model, response, started, conversation)
+    return response
+
+async def start_conversation(system, request):
     """
     Start a new conversation with initial system message and user request
     """
-    # Create the conversation
-    conversation = AssistantConversation(
+    # Create the conversation and user message
+    conversation = await AssistantConversation.objects.acreate(
         system_message=system,
         description=''
     )
-    conversation.save()
-    
-    # Create user message
-    user_message = AssistantMessage(
+    await AssistantMessage.objects.acreate(
         conversation=conversation,
         role='user',
         content=request
     )
-    user_message.save()
     
-    # Generate AI response
-    messages = [SystemMessage(content=system), HumanMessage(content=request)]
-    response = llm.invoke(messages)
+    # Generate AI response without holding a worker while the model runs
+    messages = _with_cached_prefix([SystemMessage(content=system)], request)
+    response = await _ainvoke(llm, messages, 'conversation', conversation)
     
     # Create assistant message
-    assistant_message = AssistantMessage(
+    await AssistantMessage.objects.acreate(
         conversation=conversation,
         role='assistant',
         content=response.content
     )
-    assistant_message.save()
     
     return conversation
 
-def send_message(conversation, request):
+SUMMARY_PROMPT = """You maintain a running summary of a conversation between a user and an AI assistant. Update the summary with the new messages below. Keep names, decisions, facts, open questions and anything the user asked to remember. Drop pleasantries and repetition. Return only the updated summary."""
+
+async def summarize_messages(summary, messages, conversation=None):
     """
-    Send a new message in an existing conversation
+    Fold messages into an existing conversation summary
     """
-    # Build conversation history for context
-    messages = []
-    if conversation.system_message:
-        messages.append(SystemMessage(content=conversation.system_message))
-    
-    # Add all previous messages
-    for msg in conversation.messages:
-        if msg.role == 'user':
-            messages.append(HumanMessage(content=msg.content))
-        else:
-            messages.append(AIMessage(content=msg.content))
-    
-    # Add the new user message
-    user_message = AssistantMessage(
+    transcript = "\n\n".join(f"{msg.role}: {msg.content}" for msg in messages)
+    request = f"Current summary:\n{summary or '(none)'}\n\nNew messages:\n{transcript}"
+    messages = _with_cached_prefix([SystemMessage(content=SUMMARY_PROMPT)], request)
+    response = await _ainvoke(llm, messages, 'summary', conversation)
+    return response.content
+
+async def _add_user_message(conversation, request):
+    """
+    Save the user's message and return the LLM messages to answer it with
+    """
+    # History is read before saving, then the new request is appended
+    summarize = partial(summarize_messages, conversation=conversation)
+    context = await build_context(conversation, summarize, pending=request)
+    await AssistantMessage.objects.acreate(
         conversation=conversation,
         role='user',
         content=request
     )
-    user_message.save()
-    messages.append(HumanMessage(content=request))
+    return _with_cached_prefix(context.to_messages(), request)
+
+async def send_message(conversation, request):
+    """
+    Send a new message in an existing conversation
+    """
+    messages = await _add_user_message(conversation, request)
     
     # Generate AI response
-    response = llm.invoke(messages)
+    response = await _ainvoke(llm, messages, 'conversation', conversation)
     
     # Create assistant message
-    assistant_message = AssistantMessage(
+    return await AssistantMessage.objects.acreate(
         conversation=conversation,
         role='assistant',
         content=response.content
     )
-    assistant_message.save()
-    
-    return assistant_message
 
 
-def copy_edit(text, editor_type="spotify"):
-    if editor_type == "simple":
-        system_message = """You are a professional copy editor. Your job is to improve text for:
+def _message_text(message):
+    if isinstance(message.content, str):
+        return message.content
+    # Content blocks, as sent by Anthropic for some responses and used for cache breakpoints
+    return ''.join(block.get('text', '') for block in message.content if isinstance(block, dict))
+
+async def stream_message(conversation, request):
+    """
+    Send a new message and stream the reply as it is generated.
+
+    Yields the reply text chunk by chunk, then the saved assistant
+    AssistantMessage once the model has finished. Nothing is saved for the
+    reply if the stream is abandoned part way through.
+    """
+    messages = await _add_user_message(conversation, request)
+
+    content = []
+    response = None
+    started = time.perf_counter()
+    async for chunk in llm.astream(messages):
+        # Adding chunks also adds up the usage reported along the stream
+        response = chunk if response is None else response + chunk
+        text = _message_text(chunk)
+        if text:
+            content.append(text)
+            yield text
+
+    if response is not None:
+        await _record_usage('conversation', llm, response, started, conversation)
+
+    yield await AssistantMessage.objects.acreate(
+        conversation=conversation,
+        role='assistant',
+        content=''.join(content)
+    )
+
+
+COPY_EDIT_PROMPTS = {
+    "simple": """You are a professional copy editor. Your job is to improve text for:
 
 1. Grammar and spelling accuracy
 2. Clarity and readability
 3. Proper sentence structure
 4. Consistent tone
 
-Please edit the following text to correct any errors and improve clarity while preserving the original meaning and style. Return only the edited text without any explanation or commentary."""
-    else:  # default to spotify
-        system_message = """You are a professional copy editor at Spotify working for Mike Seid, the Engineering Product Area Lead of the ML Platform Product Area. Your job is to improve text according to Spotify's culture and values while making it:
+Please edit the following text to correct any errors and improve clarity while preserving the original meaning and style. Return only the edited text without any explanation or commentary.""",
+    "spotify": """You are a professional copy editor at Spotify working for Mike Seid, the Engineering Product Area Lead of the ML Platform Product Area. Your job is to improve text according to Spotify's culture and values while making it:
 
 1. Clear and concise
 2. Fun and engaging
@@ -106,9 +200,111 @@ Spotify's core values emphasize:
 - Authenticity and being genuine
 - Agility and speed
 
-Please edit the following text to match these criteria while preserving the original meaning and intent. Return only the edited text without any explanation or commentary."""
+Please edit the following text to match these criteria while preserving the original meaning and intent. Return only the edited text without any explanation or commentary.""",
+}
 
-    messages = [SystemMessage(content=system_message), HumanMessage(content=text)]
-    response = copy_editor_llm.invoke(messages)
-    
-    return response.content
\ No newline at end of file
+def split_paragraphs(text):
+    """
+    Split text at blank lines.
+
+    Returns the paragraphs and the separators between them, so
+    paragraphs[0] + separators[0] + paragraphs[1] + ... rebuilds the text.
+    """
+    parts = re.split(r'(\n\s*\n)', text)
+    return parts[0::2], parts[1::2]
+
+def pack_paragraphs(paragraphs, separators, indexes, max_chars):
+    """
+    Group paragraph indexes into chunks of neighbouring paragraphs.
+
+    Chunks stay within max_chars where possible, a paragraph longer than
+    max_chars becomes a chunk of its own. Paragraphs that are not next to
+    each other in the text never share a chunk.
+    """
+    chunks, size = [], 0
+    for index in indexes:
+        extra = len(separators[index - 1]) + len(paragraphs[index]) if index else 0
+        if chunks and chunks[-1][-1] == index - 1 and size + extra <= max_chars:
+            chunks[-1].append(index)
+            size += extra
+        else:
+            chunks.append([index])
+            size = len(paragraphs[index])
+    return chunks
+
+async def copy_edit(text, editor_type="spotify", chunked=None):
+    """
+    Copy edit text, splitting long text into paragraph chunks edited in parallel.
+
+    chunked forces the mode either way, by default text longer than
+    COPY_EDIT_CHUNK_CHARS is chunked. Chunked edits are cached per
+    paragraph, so re-editing a document only sends the paragraphs that
+    changed, packed into chunks of their own.
+    """
+    max_chars = getattr(settings, 'COPY_EDIT_CHUNK_CHARS', 4000)
+    if chunked is None:
+        chunked = len(text) > max_chars
+    if not chunked:
+        return await _copy_edit_text(text, editor_type)
+
+    paragraphs, separators = split_paragraphs(text)
+    edited = list(paragraphs)
+    keys, missed = {}, []
+    for index, paragraph in enumerate(paragraphs):
+        # Blank paragraphs (leading or trailing whitespace) need no editing
+        if not paragraph.strip():
+            continue
+        keys[index] = _copy_edit_key(paragraph, editor_type)
+        cached = await copy_edit_cache.get(keys[index])
+        if cached is None:
+            missed.append(index)
+        else:
+            edited[index] = cached
+
+    semaphore = asyncio.Semaphore(getattr(settings, 'COPY_EDIT_CONCURRENCY', 4))
+
+    async def edit(chunk):
+        chunk_text = paragraphs[chunk[0]] + ''.join(separators[index - 1] + paragraphs[index] for index in chunk[1:])
+        async with semaphore:
+            result = await _request_copy_edit(chunk_text, editor_type)
+        results, _ = split_paragraphs(result)
+        if len(results) != len(chunk):
+            # The paragraphs were merged or split, keep the chunk whole and uncached
+            edited[chunk[0]] = result
+            for index in chunk[1:]:
+                edited[index] = separators[index - 1] = ''
+            return
+        for index, paragraph in zip(chunk, results):
+            edited[index] = paragraph
+            await copy_edit_cache.put(keys[index], editor_type, _copy_edit_model(), paragraph)
+
+    await asyncio.gather(*(edit(chunk) for chunk in pack_paragraphs(paragraphs, separators, missed, max_chars)))
+    return ''.join(itertools.chain.from_iterable(itertools.zip_longest(edited, separators, fillvalue='')))
+
+def _copy_edit_prompt(editor_type):
+    # Anything but simple gets the default Spotify editor
+    return COPY_EDIT_PROMPTS.get(editor_type, COPY_EDIT_PROMPTS["spotify"])
+
+def _copy_edit_model():
+    return getattr(copy_editor_llm, 'model', '')
+
+def _copy_edit_key(text, editor_type):
+    return copy_edit_cache.cache_key(editor_type, _copy_edit_prompt(editor_type), _copy_edit_model(), text)
+
+async def _request_copy_edit(text, editor_type):
+    messages = _with_cached_prefix([SystemMessage(content=_copy_edit_prompt(editor_type))], text)
+    response = await _ainvoke(copy_editor_llm, messages, 'copy_edit')
+    return response.content
+
+async def _copy_edit_text(text, editor_type):
+    """
+    Copy edit text in one request, reusing the stored result for an identical request
+    """
+    key = _copy_edit_key(text, editor_type)
+    cached = await copy_edit_cache.get(key)
+    if cached is not None:
+        return cached
+
+    result = await _request_copy_edit(text, editor_type)
+    await copy_edit_cache.put(key, editor_type, _copy_edit_model(), result)
+    return result
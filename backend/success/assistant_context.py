@@ -0,0 +1,103 @@
+"""
+Bounded conversation history for assistant prompts.
+
+Recent messages are sent verbatim. Once the history grows past
+ASSISTANT_CONTEXT_TOKENS, the oldest messages are folded into a rolling
+summary stored on the conversation, and only the messages after it are
+replayed. Folding goes down to half the budget, so the summary is
+refreshed every few turns rather than on every one.
+"""
+import math
+from dataclasses import dataclass, field
+from typing import List
+
+from django.conf import settings
+from langchain.schema import AIMessage, HumanMessage, SystemMessage
+
+# Rough average for English text with Claude's tokenizer
+CHARS_PER_TOKEN = 4
+# Role markers and separators around each message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap, slightly pessimistic token count for a message"""
+    return math.ceil(len(text) / CHARS_PER_TOKEN) + MESSAGE_OVERHEAD_TOKENS
+
+
+def context_budget() -> int:
+    return getattr(settings, 'ASSISTANT_CONTEXT_TOKENS', 12000)
+
+
+@dataclass
+class ConversationContext:
+    """What to send the model for the next turn"""
+    system_message: str
+    summary: str
+    recent: List = field(default_factory=list)
+
+    def to_messages(self):
+        messages = []
+        system = self.system_message
+        if self.summary:
+            system = f"{system}\n\nSummary of the earlier conversation:\n{self.summary}".strip()
+        if system:
+            messages.append(SystemMessage(content=system))
+        for msg in self.recent:
+            if msg.role == 'user':
+                messages.append(HumanMessage(content=msg.content))
+            else:
+                messages.append(AIMessage(content=msg.content))
+        return messages
+
+    @property
+    def estimated_tokens(self) -> int:
+        return sum(estimate_tokens(text) for text in [self.system_message, self.summary, *(m.content for m in self.recent)])
+
+
+def split_history(history, budget):
+    """
+    Split messages into those to fold into the summary and those to keep.
+
+    Keeps the newest messages that fit in the budget, starting on a user
+    message so the replayed history opens with a user turn.
+    """
+    kept, used = 0, 0
+    for msg in reversed(history):
+        used += estimate_tokens(msg.content)
+        if used > budget:
+            break
+        kept += 1
+
+    start = len(history) - kept
+    while start < len(history) and history[start].role != 'user':
+        start += 1
+    return history[:start], history[start:]
+
+
+async def build_context(conversation, summarize, pending=''):
+    """
+    Collect the history to send with the pending request.
+
+    summarize(summary, messages) is awaited to fold messages into the
+    existing summary when the history is over budget. The new summary is
+    saved on the conversation.
+    """
+    history = [
+        msg async for msg in
+        conversation.assistant_messages.order_by('created_at')[conversation.summarized_message_count:]
+    ]
+    budget = context_budget() - estimate_tokens(pending)
+
+    if sum(estimate_tokens(msg.content) for msg in history) > budget:
+        folded, history = split_history(history, budget // 2)
+        if folded:
+            conversation.summary = await summarize(conversation.summary, folded)
+            conversation.summarized_message_count += len(folded)
+            await conversation.asave(update_fields=['summary', 'summarized_message_count'])
+
+    return ConversationContext(
+        system_message=conversation.system_message,
+        summary=conversation.summary,
+        recent=history,
+    )
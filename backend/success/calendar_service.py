@@ -1,16 +1,24 @@
 import os
 import json
 import datetime
+import time
+import threading
 import pytz
+import httplib2
 from dateutil import parser
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from typing import List, Dict, Any, Optional, Tuple
 from cryptography.fernet import Fernet
 from django.conf import settings
+from django.db import transaction
+from django.db.models import Prefetch, Q
 from django.utils import timezone
 
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
+from google_auth_httplib2 import AuthorizedHttp
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
@@ -18,7 +26,7 @@ from googleapiclient.errors import HttpError
 from langchain_anthropic import ChatAnthropic
 from langchain.schema import HumanMessage, SystemMessage
 
-from .models import GoogleCredentials, CalendarSettings, NotificationSettings, CalendarEmailLog
+from .models import GoogleCredentials, CalendarSettings, CalendarEvent, NotificationSettings, CalendarEmailLog
 
 # If modifying these scopes, delete the existing credentials
 SCOPES = ['https://www.googleapis.com/auth/calendar.readonly']
@@ -26,6 +34,130 @@ SCOPES = ['https://www.googleapis.com/auth/calendar.readonly']
 # Initialize Anthropic for calendar summaries
 calendar_llm = ChatAnthropic(model_name="claude-sonnet-4-20250514")
 
+# Google rejects batches of more than 50 calls
+MAX_BATCH_SIZE = 50
+
+
+@dataclass
+class CalendarFetch:
+    """Timing and outcome of fetching one calendar's events"""
+    account_name: str
+    calendar_name: str
+    seconds: float
+    event_count: int = 0
+    error: Optional[str] = None
+
+
+@dataclass
+class CalendarChanges:
+    """Everything that changed in one calendar since its last sync"""
+    calendar: CalendarSettings
+    items: List[Dict]
+    sync_token: str
+    # A full sync replaces every stored event rather than updating them
+    full: bool
+    error: Optional[Exception]
+    seconds: float
+
+
+@dataclass
+class CalendarClient:
+    """A built Calendar service with the credentials and connection it talks through"""
+    credentials: Credentials
+    service: Any
+    http: Any
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+class CalendarClientCache:
+    """Built clients per account, reused across runs until the credentials change
+
+    Entries are stamped with the account's encrypted credentials, so a
+    refresh or re-authorisation written to the database never gets an old
+    client back, and a client whose token has expired is dropped so the
+    next caller refreshes it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients = {}
+
+    def get(self, google_creds: GoogleCredentials) -> Optional[CalendarClient]:
+        with self._lock:
+            entry = self._clients.get(google_creds.pk)
+            if entry is None:
+                return None
+            stamp, client = entry
+            if stamp != google_creds.encrypted_credentials or not client.credentials.valid:
+                del self._clients[google_creds.pk]
+                return None
+            return client
+
+    def put(self, google_creds: GoogleCredentials, client: CalendarClient):
+        with self._lock:
+            self._clients[google_creds.pk] = (google_creds.encrypted_credentials, client)
+
+    def invalidate(self, google_creds: Optional[GoogleCredentials] = None):
+        """Drop the client for one account, or for every account"""
+        with self._lock:
+            if google_creds is None:
+                self._clients.clear()
+            else:
+                self._clients.pop(google_creds.pk, None)
+
+    def __len__(self):
+        return len(self._clients)
+
+
+client_cache = CalendarClientCache()
+
+
+class CredentialCache:
+    """Decrypted credentials per account, so Fernet runs once per TTL rather than on every call
+
+    Entries are stamped with the encrypted credentials they came from, a
+    change in the database is never answered from the cache.
+    """
+
+    def __init__(self, ttl=3600.0, clock=time.monotonic):
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._credentials = {}
+
+    def get(self, google_creds: GoogleCredentials, decrypt) -> dict:
+        """Return the account's decrypted credentials, decrypting them on a miss"""
+        stamp = google_creds.encrypted_credentials
+        with self._lock:
+            entry = self._credentials.get(google_creds.pk)
+            if entry and entry[0] == stamp and self._clock() - entry[2] < self.ttl:
+                return dict(entry[1])
+
+        cred_dict = decrypt(stamp)
+        with self._lock:
+            self._credentials[google_creds.pk] = (stamp, cred_dict, self._clock())
+        return dict(cred_dict)
+
+    def put(self, google_creds: GoogleCredentials, cred_dict: dict):
+        with self._lock:
+            self._credentials[google_creds.pk] = (google_creds.encrypted_credentials, dict(cred_dict), self._clock())
+
+    def invalidate(self, google_creds: Optional[GoogleCredentials] = None):
+        """Drop the credentials for one account, or for every account"""
+        with self._lock:
+            if google_creds is None:
+                self._credentials.clear()
+            else:
+                self._credentials.pop(google_creds.pk, None)
+
+    def __len__(self):
+        return len(self._credentials)
+
+
+credential_cache = CredentialCache(
+    ttl=getattr(settings, 'CALENDAR_CREDENTIAL_CACHE_TTL', 3600.0),
+)
+
 
 class CalendarService:
     """Service for Google Calendar integration and email summaries"""
@@ -33,6 +165,7 @@ class CalendarService:
     def __init__(self):
         self.encryption_key = self._get_encryption_key()
         self.fernet = Fernet(self.encryption_key)
+        self.fetch_timings: List[CalendarFetch] = []
     
     def _get_encryption_key(self) -> bytes:
         """Get encryption key for storing credentials"""
@@ -88,20 +221,15 @@ class CalendarService:
             )
             
             # Test the credentials by making a simple API call
-            service = build('calendar', 'v3', credentials=credentials)
+            client = self._build_client(credentials)
+            service = client.service
             # Try to list calendars to verify access
             calendar_list = service.calendarList().list().execute()
             
             # If we get here, credentials are valid
             # Store credentials in our format
-            cred_dict = {
-                'token': credentials.token,
-                'refresh_token': credentials.refresh_token,
-                'token_uri': credentials.token_uri,
-                'client_id': credentials.client_id,
-                'client_secret': credentials.client_secret,
-                'scopes': credentials.scopes or SCOPES
-            }
+            cred_dict = self._credentials_dict(credentials)
+            cred_dict['scopes'] = cred_dict['scopes'] or SCOPES
             
             encrypted_creds = self.encrypt_credentials(cred_dict)
             
@@ -116,6 +244,8 @@ class CalendarService:
                 }
             )
             
+            client_cache.put(google_creds, client)
+            
             # Auto-discover and save calendars
             self._discover_calendars_from_service(google_creds, service)
             
@@ -165,9 +295,27 @@ class CalendarService:
         except Exception as e:
             print(f"Error discovering calendars for {google_creds.account_name}: {e}")
     
-    def _get_calendar_service(self, google_creds: GoogleCredentials):
-        """Get authenticated Google Calendar service"""
-        cred_dict = self.decrypt_credentials(google_creds.encrypted_credentials)
+    def _credentials_dict(self, credentials: Credentials) -> dict:
+        """Credentials in the form they are stored, encrypted, in the database"""
+        return {
+            'token': credentials.token,
+            'refresh_token': credentials.refresh_token,
+            'token_uri': credentials.token_uri,
+            'client_id': credentials.client_id,
+            'client_secret': credentials.client_secret,
+            'scopes': credentials.scopes,
+            'expiry': credentials.expiry.isoformat() if credentials.expiry else None,
+        }
+    
+    def _load_credentials(self, google_creds: GoogleCredentials) -> Tuple[Credentials, bool]:
+        """Decrypt stored credentials, refreshing the token if it has expired
+
+        Returns the credentials and whether they were refreshed. Nothing is
+        written back here so this is safe to call from worker threads.
+        Tokens are normally renewed ahead of time by refresh_tokens, so the
+        refresh here is only a fallback.
+        """
+        cred_dict = credential_cache.get(google_creds, self.decrypt_credentials)
         
         credentials = Credentials(
             token=cred_dict['token'],
@@ -175,30 +323,398 @@ class CalendarService:
             token_uri=cred_dict['token_uri'],
             client_id=cred_dict['client_id'],
             client_secret=cred_dict['client_secret'],
-            scopes=cred_dict['scopes']
+            scopes=cred_dict['scopes'],
+            # Google's credentials expect a naive UTC expiry
+            expiry=parser.isoparse(cred_dict['expiry']) if cred_dict.get('expiry') else None,
         )
         
         # Refresh if needed
+        refreshed = False
         if not credentials.valid:
             if credentials.expired and credentials.refresh_token:
                 credentials.refresh(Request())
-                # Update stored credentials
-                updated_dict = {
-                    'token': credentials.token,
-                    'refresh_token': credentials.refresh_token,
-                    'token_uri': credentials.token_uri,
-                    'client_id': credentials.client_id,
-                    'client_secret': credentials.client_secret,
-                    'scopes': credentials.scopes
-                }
-                google_creds.encrypted_credentials = self.encrypt_credentials(updated_dict)
-                google_creds.last_used = timezone.now()
-                google_creds.save()
+                refreshed = True
+        
+        return credentials, refreshed
+    
+    def _store_refreshed_credentials(self, google_creds: GoogleCredentials, credentials: Credentials):
+        """Write a refreshed token back to the database, touching only the fields that changed"""
+        updated_dict = self._credentials_dict(credentials)
+        google_creds.encrypted_credentials = self.encrypt_credentials(updated_dict)
+        google_creds.last_used = timezone.now()
+        GoogleCredentials.objects.filter(pk=google_creds.pk).update(
+            encrypted_credentials=google_creds.encrypted_credentials,
+            last_used=google_creds.last_used,
+        )
+        credential_cache.put(google_creds, updated_dict)
+        client_cache.invalidate(google_creds)
+    
+    def _expires_within(self, credentials: Credentials, margin: datetime.timedelta) -> bool:
+        """Whether the token is missing, of unknown age or expires within margin"""
+        if not credentials.token or credentials.expiry is None:
+            return True
+        now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        return credentials.expiry - now < margin
+    
+    def _refresh_if_expiring(self, google_creds: GoogleCredentials,
+                             margin: datetime.timedelta) -> Tuple[Optional[Credentials], Optional[Exception]]:
+        """Refresh one account's token if it is about to expire, returning the new credentials"""
+        try:
+            credentials, refreshed = self._load_credentials(google_creds)
+            if not refreshed and credentials.refresh_token and self._expires_within(credentials, margin):
+                credentials.refresh(Request())
+                refreshed = True
+            return (credentials if refreshed else None), None
+        except Exception as e:
+            return None, e
+    
+    def refresh_tokens(self) -> Tuple[List[str], List[str]]:
+        """Renew every active account's token that expires within CALENDAR_TOKEN_REFRESH_MINUTES
+
+        Run ahead of the daily email so the send never waits on a refresh.
+        Returns the names of the accounts refreshed and of those that failed.
+        """
+        margin = datetime.timedelta(minutes=getattr(settings, 'CALENDAR_TOKEN_REFRESH_MINUTES', 20))
+        accounts = list(GoogleCredentials.objects.filter(is_active=True).order_by('account_name', 'account_id'))
         
-        return build('calendar', 'v3', credentials=credentials)
+        workers = getattr(settings, 'CALENDAR_FETCH_WORKERS', 8)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(lambda google_creds: self._refresh_if_expiring(google_creds, margin), accounts))
+        
+        refreshed, failed = [], []
+        for google_creds, (credentials, error) in zip(accounts, results):
+            if error is not None:
+                print(f'Error refreshing token for {google_creds.account_name}: {error}')
+                failed.append(google_creds.account_name)
+            elif credentials is not None:
+                self._store_refreshed_credentials(google_creds, credentials)
+                refreshed.append(google_creds.account_name)
+        return refreshed, failed
+    
+    def _authorized_http(self, credentials: Credentials):
+        """An authorized connection of its own, httplib2 connections are not thread safe"""
+        return AuthorizedHttp(credentials, http=httplib2.Http())
+    
+    def _build_service(self, http):
+        """Build a Google Calendar service from the bundled discovery document"""
+        return build('calendar', 'v3', http=http, static_discovery=True)
+    
+    def _build_client(self, credentials: Credentials) -> CalendarClient:
+        http = self._authorized_http(credentials)
+        return CalendarClient(credentials=credentials, service=self._build_service(http), http=http)
+    
+    def _get_client(self, google_creds: GoogleCredentials) -> Tuple[CalendarClient, bool]:
+        """Return the cached client for an account, building one on a miss
+
+        Also returns whether the token was refreshed, in which case the
+        caller should store the credentials before caching the client.
+        """
+        client = client_cache.get(google_creds)
+        if client is not None:
+            return client, False
+        credentials, refreshed = self._load_credentials(google_creds)
+        return self._build_client(credentials), refreshed
     
-    def get_tomorrow_events(self) -> Tuple[List[Dict], datetime.date]:
-        """Get events for tomorrow from all enabled calendars"""
+    def _get_calendar_service(self, google_creds: GoogleCredentials):
+        """Get authenticated Google Calendar service"""
+        client, refreshed = self._get_client(google_creds)
+        if refreshed:
+            self._store_refreshed_credentials(google_creds, client.credentials)
+        client_cache.put(google_creds, client)
+        return client.service
+    
+    def _prepare_account(self, google_creds: GoogleCredentials) -> Optional[Tuple[CalendarClient, bool]]:
+        """Get the client for one account, or None on failure"""
+        try:
+            print(f"Fetching events for account: {google_creds}")
+            return self._get_client(google_creds)
+        except Exception as e:
+            print(f'Error with account {google_creds.account_name}: {e}')
+            return None
+    
+    def _events_request(self, service, calendar_setting: CalendarSettings, sync_token: Optional[str],
+                        window: Tuple[str, str], page_token: Optional[str] = None):
+        """One page of changes since sync_token, or of every event in the window for a full sync"""
+        params = {
+            'calendarId': calendar_setting.calendar_id,
+            'singleEvents': True,
+            'maxResults': 2500,
+        }
+        if sync_token:
+            params['syncToken'] = sync_token
+        else:
+            # Bounded at both ends, or open ended recurring events expand forever
+            params['timeMin'], params['timeMax'] = window
+        if page_token:
+            params['pageToken'] = page_token
+        return service.events().list(**params)
+    
+    def _execute(self, request) -> Tuple[Optional[Dict], Optional[Exception]]:
+        try:
+            return request.execute(), None
+        except Exception as e:
+            return None, e
+    
+    def _collect_changes(self, calendar_setting: CalendarSettings, client: CalendarClient, window: Tuple[str, str],
+                         response: Optional[Dict], error: Optional[Exception],
+                         started: float) -> CalendarChanges:
+        """Follow a calendar's first page of changes through to its next sync token
+
+        A 410 means Google has expired the sync token, so the calendar is
+        synced again from scratch.
+        """
+        sync_token = calendar_setting.sync_token or None
+        items = []
+        while True:
+            if sync_token and isinstance(error, HttpError) and error.resp.status == 410:
+                print(f'Sync token for {calendar_setting.calendar_name} expired, running a full sync')
+                sync_token, items = None, []
+                response, error = self._execute(self._events_request(client.service, calendar_setting, None, window))
+                continue
+            if error is not None:
+                break
+            items.extend(response.get('items', []))
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                break
+            response, error = self._execute(
+                self._events_request(client.service, calendar_setting, sync_token, window, page_token)
+            )
+        
+        return CalendarChanges(
+            calendar=calendar_setting,
+            items=items,
+            sync_token=response.get('nextSyncToken', '') if error is None else '',
+            full=sync_token is None,
+            error=error,
+            seconds=time.perf_counter() - started,
+        )
+    
+    def _fetch_first_pages(self, calendars: List[CalendarSettings], client: CalendarClient,
+                           window: Tuple[str, str]) -> List[Tuple[Optional[Dict], Optional[Exception]]]:
+        """Fetch the first page of changes for several calendars in one batched round trip
+
+        Errors for individual calendars come back per calendar, the batch
+        only raises if the round trip as a whole failed.
+        """
+        responses = {}
+        
+        def collect(request_id, response, exception):
+            responses[request_id] = (response, exception)
+        
+        batch = client.service.new_batch_http_request(callback=collect)
+        for index, calendar_setting in enumerate(calendars):
+            request = self._events_request(client.service, calendar_setting, calendar_setting.sync_token, window)
+            batch.add(request, request_id=str(index))
+        batch.execute()
+        return [responses[str(index)] for index in range(len(calendars))]
+    
+    def _fetch_account_changes(self, google_creds: GoogleCredentials, client: CalendarClient,
+                               window: Tuple[str, str]) -> List[CalendarChanges]:
+        """Fetch what changed in every enabled calendar of an account
+
+        The first page of every calendar goes out in a single batch, in the
+        steady state that is all there is. Should the batch fail the
+        calendars are fetched one at a time instead.
+        """
+        calendars = google_creds.enabled_calendars
+        changes = []
+        # The client's connection is shared with any other run using this account
+        with client.lock:
+            for offset in range(0, len(calendars), MAX_BATCH_SIZE):
+                chunk = calendars[offset:offset + MAX_BATCH_SIZE]
+                started = time.perf_counter()
+                try:
+                    first_pages = self._fetch_first_pages(chunk, client, window)
+                except Exception as e:
+                    print(f'Batch request for {google_creds.account_name} failed, fetching calendars one at a time: {e}')
+                    first_pages = [
+                        self._execute(self._events_request(client.service, calendar_setting, calendar_setting.sync_token, window))
+                        for calendar_setting in chunk
+                    ]
+                changes.extend(
+                    self._collect_changes(calendar_setting, client, window, response, error, started)
+                    for calendar_setting, (response, error) in zip(chunk, first_pages)
+                )
+        return changes
+    
+    def _event_bounds(self, event: Dict, local_timezone) -> Tuple[datetime.datetime, datetime.datetime, bool]:
+        """Start, end and whether the event is all day, all day events run midnight to midnight locally"""
+        start, end = event['start'], event['end']
+        if 'dateTime' in start:
+            return parser.isoparse(start['dateTime']), parser.isoparse(end['dateTime']), False
+        
+        def midnight(value):
+            return local_timezone.localize(datetime.datetime.combine(datetime.date.fromisoformat(value), datetime.time()))
+        return midnight(start['date']), midnight(end['date']), True
+    
+    def _apply_changes(self, changes: CalendarChanges, local_timezone, window_end: datetime.datetime):
+        """Write one calendar's changes to the local event store"""
+        calendar_setting = changes.calendar
+        # The same event can turn up more than once across pages, the last one wins
+        latest = {item['id']: item for item in changes.items}
+        cancelled = [event_id for event_id, item in latest.items() if item.get('status') == 'cancelled']
+        events = []
+        for event_id, item in latest.items():
+            if item.get('status') == 'cancelled':
+                continue
+            start, end, all_day = self._event_bounds(item, local_timezone)
+            events.append(CalendarEvent(
+                calendar=calendar_setting,
+                event_id=event_id,
+                event_type=item.get('eventType', ''),
+                start=start,
+                end=end,
+                all_day=all_day,
+                data=item,
+            ))
+        
+        with transaction.atomic():
+            if changes.full:
+                calendar_setting.events.all().delete()
+            elif cancelled:
+                calendar_setting.events.filter(event_id__in=cancelled).delete()
+            CalendarEvent.objects.bulk_create(
+                events,
+                update_conflicts=True,
+                unique_fields=['calendar', 'event_id'],
+                update_fields=['event_type', 'start', 'end', 'all_day', 'data', 'updated_at'],
+            )
+            synced = {'sync_token': changes.sync_token, 'synced_at': timezone.now()}
+            if changes.full:
+                synced['synced_until'] = window_end
+            CalendarSettings.objects.filter(pk=calendar_setting.pk).update(**synced)
+    
+    def sync_calendars(self) -> List[CalendarFetch]:
+        """Bring the local event store up to date with every enabled calendar
+
+        Accounts are fetched concurrently on a bounded thread pool. Calendars
+        with a sync token only transfer what changed since the last run,
+        the rest do a full sync of everything from CALENDAR_SYNC_PAST_DAYS
+        ago to CALENDAR_SYNC_FUTURE_DAYS ahead. Unchanged events past the end
+        of that window are never sent as changes, so once half of it has
+        gone by the calendar is synced in full again to move it forward. A
+        failing account or calendar keeps its stored events and is retried
+        on the next run. Per calendar timings are returned and left on
+        self.fetch_timings.
+        """
+        local_timezone = pytz.timezone(NotificationSettings.get_solo().timezone)
+        now = timezone.now()
+        future = datetime.timedelta(days=getattr(settings, 'CALENDAR_SYNC_FUTURE_DAYS', 90))
+        window_start = now - datetime.timedelta(days=getattr(settings, 'CALENDAR_SYNC_PAST_DAYS', 7))
+        window_end = now + future
+        window = (window_start.isoformat(), window_end.isoformat())
+        
+        # Load everything from the database up front, the worker threads only talk to Google
+        accounts = list(
+            GoogleCredentials.objects.filter(is_active=True)
+            .order_by('account_name', 'account_id')
+            .prefetch_related(Prefetch(
+                'calendar_settings',
+                queryset=CalendarSettings.objects.filter(is_enabled=True).order_by('calendar_name', 'calendar_id'),
+                to_attr='enabled_calendars',
+            ))
+        )
+        
+        workers = getattr(settings, 'CALENDAR_FETCH_WORKERS', 8)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            prepared = list(pool.map(self._prepare_account, accounts))
+            
+            fetches = []
+            for google_creds, account in zip(accounts, prepared):
+                if account is None:
+                    continue
+                client, refreshed = account
+                if refreshed:
+                    self._store_refreshed_credentials(google_creds, client.credentials)
+                client_cache.put(google_creds, client)
+                for calendar_setting in google_creds.enabled_calendars:
+                    if not calendar_setting.synced_until or calendar_setting.synced_until - now < future / 2:
+                        calendar_setting.sync_token = ''
+                fetches.append((google_creds, pool.submit(self._fetch_account_changes, google_creds, client, window)))
+            
+            # Apply each account's changes as it arrives, in a fixed order
+            self.fetch_timings = []
+            for google_creds, fetch in fetches:
+                for changes in fetch.result():
+                    error = changes.error
+                    if error is None:
+                        try:
+                            self._apply_changes(changes, local_timezone, window_end)
+                        except Exception as e:
+                            error = e
+                    if error is not None:
+                        print(f'Error syncing events from {changes.calendar.calendar_name}: {error}')
+                    self.fetch_timings.append(CalendarFetch(
+                        account_name=google_creds.account_name,
+                        calendar_name=changes.calendar.calendar_name,
+                        seconds=changes.seconds,
+                        event_count=len(changes.items),
+                        error=str(error) if error is not None else None,
+                    ))
+        
+        # Only the sync window is kept, events outside it may never be sent again
+        CalendarEvent.objects.filter(Q(end__lt=window_start) | Q(start__gt=window_end)).delete()
+        
+        for timing in self.fetch_timings:
+            status = f"failed: {timing.error}" if timing.error else f"{timing.event_count} changes"
+            print(f"Synced {timing.account_name} / {timing.calendar_name} in {timing.seconds * 1000:.0f}ms ({status})")
+        return self.fetch_timings
+    
+    def _annotate_event(self, calendar_event: CalendarEvent) -> Dict:
+        """The stored event with its calendar metadata and the account's response"""
+        event = dict(calendar_event.data)
+        calendar_setting = calendar_event.calendar
+        event['calendarId'] = calendar_setting.calendar_id
+        event['calendarName'] = calendar_setting.calendar_name
+        event['accountName'] = calendar_setting.google_credentials.account_name
+        
+        # Determine response status
+        response_status = None
+        if 'attendees' in event:
+            for attendee in event['attendees']:
+                if (attendee.get('email') == calendar_setting.calendar_id or 
+                    attendee.get('self', False)):
+                    response_status = attendee.get('responseStatus')
+                    break
+        
+        # If no response status found and user is organizer, assume accepted
+        if response_status is None and 'organizer' in event:
+            if event['organizer'].get('email') == calendar_setting.calendar_id:
+                response_status = 'accepted'
+        
+        event['responseStatus'] = response_status
+        return event
+    
+    def get_events(self, start: datetime.datetime, end: datetime.datetime) -> List[Dict]:
+        """Stored events overlapping start to end, in account, calendar and start order"""
+        calendar_events = (
+            CalendarEvent.objects
+            .filter(
+                calendar__is_enabled=True,
+                calendar__google_credentials__is_active=True,
+                start__lt=end,
+                end__gt=start,
+            )
+            # Skip working location events
+            .exclude(event_type='workingLocation')
+            .select_related('calendar__google_credentials')
+            .order_by(
+                'calendar__google_credentials__account_name', 'calendar__google_credentials__account_id',
+                'calendar__calendar_name', 'calendar__calendar_id', 'start', 'event_id',
+            )
+        )
+        return [self._annotate_event(calendar_event) for calendar_event in calendar_events]
+    
+    def get_tomorrow_events(self, sync: bool = True) -> Tuple[List[Dict], datetime.date]:
+        """Get events for tomorrow from all enabled calendars
+
+        Syncs the local event store first unless sync is False, then reads
+        tomorrow's events from it.
+        """
+        if sync:
+            self.sync_calendars()
+        
         # Get notification settings for timezone
         notification_settings = NotificationSettings.get_solo()
         local_timezone = pytz.timezone(notification_settings.timezone)
@@ -208,64 +724,7 @@ class CalendarService:
         tomorrow_start = (now + datetime.timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
         tomorrow_end = tomorrow_start + datetime.timedelta(days=1)
         
-        # Convert to ISO format for API
-        time_min = tomorrow_start.isoformat()
-        time_max = tomorrow_end.isoformat()
-        
-        all_events = []
-        
-        # Get all active Google credentials
-        for google_creds in GoogleCredentials.objects.filter(is_active=True):
-            try:
-                print(f"Fetching events for account: {google_creds}")
-                service = self._get_calendar_service(google_creds)
-                # Get events from all enabled calendars for this account
-                for calendar_setting in google_creds.calendar_settings.filter(is_enabled=True):
-                    try:
-                        events_result = service.events().list(
-                            calendarId=calendar_setting.calendar_id,
-                            timeMin=time_min,
-                            timeMax=time_max,
-                            singleEvents=True,
-                            orderBy='startTime'
-                        ).execute()
-                        
-                        events = events_result.get('items', [])
-                        
-                        # Add metadata to each event
-                        for event in events:
-                            # Skip working location events
-                            if event.get('eventType') == 'workingLocation':
-                                continue
-                                
-                            event['calendarId'] = calendar_setting.calendar_id
-                            event['calendarName'] = calendar_setting.calendar_name
-                            event['accountName'] = google_creds.account_name
-                            
-                            # Determine response status
-                            response_status = None
-                            if 'attendees' in event:
-                                for attendee in event['attendees']:
-                                    if (attendee.get('email') == calendar_setting.calendar_id or 
-                                        attendee.get('self', False)):
-                                        response_status = attendee.get('responseStatus')
-                                        break
-                            
-                            # If no response status found and user is organizer, assume accepted
-                            if response_status is None and 'organizer' in event:
-                                if event['organizer'].get('email') == calendar_setting.calendar_id:
-                                    response_status = 'accepted'
-                            
-                            event['responseStatus'] = response_status
-                            all_events.append(event)
-                            
-                    except HttpError as error:
-                        print(f'Error fetching events from {calendar_setting.calendar_name}: {error}')
-                        
-            except Exception as e:
-                print(f'Error with account {google_creds.account_name}: {e}')
-        
-        return all_events, tomorrow_start.date()
+        return self.get_events(tomorrow_start, tomorrow_end), tomorrow_start.date()
     
     def format_time(self, dt_str: str, timezone_str: str = 'America/New_York') -> str:
         """Format datetime string to readable time format"""
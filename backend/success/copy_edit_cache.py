@@ -0,0 +1,71 @@
+"""
+Persistent cache for copy edit results.
+
+Entries are keyed on a hash of the editor type, the system prompt, the
+model and the text, so changing a prompt or model never serves old edits.
+Entries expire after COPY_EDIT_CACHE_TTL_DAYS, and the least recently used
+are evicted beyond COPY_EDIT_CACHE_SIZE. Hit and miss counters are per
+process, like the search cache.
+"""
+import hashlib
+import json
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from .models import CopyEditCacheEntry
+
+
+@dataclass
+class CopyEditCacheStats:
+    hits: int = 0
+    misses: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+stats = CopyEditCacheStats()
+
+
+def cache_key(editor_type, system_prompt, model_name, text) -> str:
+    payload = json.dumps([editor_type, system_prompt, model_name, text])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _ttl():
+    return timedelta(days=getattr(settings, 'COPY_EDIT_CACHE_TTL_DAYS', 30))
+
+
+async def get(key):
+    """Return the cached result for key, or None when missing or expired"""
+    fresh = CopyEditCacheEntry.objects.filter(key=key, created_at__gte=timezone.now() - _ttl())
+    result = await fresh.values_list('result', flat=True).afirst()
+    if result is None:
+        stats.misses += 1
+        return None
+
+    stats.hits += 1
+    await fresh.aupdate(hits=F('hits') + 1, last_used_at=timezone.now())
+    return result
+
+
+async def put(key, editor_type, model_name, result):
+    """Store a result, then drop expired and least recently used entries"""
+    # One upsert, so concurrent misses on the same key can't collide
+    await CopyEditCacheEntry.objects.abulk_create(
+        [CopyEditCacheEntry(key=key, editor_type=editor_type, model_name=model_name, result=result)],
+        update_conflicts=True,
+        unique_fields=['key'],
+        update_fields=['editor_type', 'model_name', 'result', 'hits', 'created_at', 'last_used_at'],
+    )
+
+    await CopyEditCacheEntry.objects.filter(created_at__lt=timezone.now() - _ttl()).adelete()
+    max_size = getattr(settings, 'COPY_EDIT_CACHE_SIZE', 10000)
+    evicted = CopyEditCacheEntry.objects.order_by('-last_used_at', 'key').values('key')[max_size:]
+    await CopyEditCacheEntry.objects.filter(key__in=evicted).adelete()
@@ -0,0 +1,182 @@
+"""
+Background jobs stored in Postgres.
+
+Mutations enqueue a Job row and return straight away, and clients poll the
+job for its result. Workers (manage.py run_jobs) claim due jobs with
+SELECT ... FOR UPDATE SKIP LOCKED, so any number of them can share the
+table without two taking the same job. Failures are retried with
+exponential backoff up to the job's max_attempts. Jobs still running after
+JOB_TIMEOUT seconds are assumed lost with their worker and queued again,
+or failed once they are out of attempts.
+"""
+import inspect
+import logging
+import time
+import traceback
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import assistant
+from .models import AssistantConversation, Job
+
+logger = logging.getLogger(__name__)
+
+# Job kind -> (function, max attempts)
+handlers = {}
+
+RETRY_DELAY = 5
+
+
+def handler(kind, max_attempts=3):
+    """Register a function, sync or async, to run jobs of this kind"""
+    def register(func):
+        handlers[kind] = (func, max_attempts)
+        return func
+    return register
+
+
+def enqueue(kind, **payload) -> Job:
+    if kind not in handlers:
+        raise ValueError(f"Unknown job kind: {kind}")
+    _, max_attempts = handlers[kind]
+    return Job.objects.create(kind=kind, payload=payload, max_attempts=max_attempts)
+
+
+def claim():
+    """Mark the next due job as running and return it, or None if there is none"""
+    with transaction.atomic():
+        job = (
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(status=Job.QUEUED, run_after__lte=timezone.now())
+            .order_by('run_after', 'created_at')
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = Job.RUNNING
+        job.attempts += 1
+        job.started_at = timezone.now()
+        job.save(update_fields=['status', 'attempts', 'started_at', 'updated_at'])
+    return job
+
+
+def run(job):
+    """Run a claimed job and record its result or failure"""
+    try:
+        func, _ = handlers[job.kind]
+        if inspect.iscoroutinefunction(func):
+            func = async_to_sync(func)
+        result = func(**job.payload)
+    except Exception:
+        logger.exception("Job %s (%s) failed on attempt %s", job.id, job.kind, job.attempts)
+        job.error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            job.status = Job.QUEUED
+            job.run_after = timezone.now() + timedelta(seconds=RETRY_DELAY * 2 ** (job.attempts - 1))
+        else:
+            job.status = Job.FAILED
+            job.finished_at = timezone.now()
+    else:
+        job.status = Job.SUCCEEDED
+        job.result = result
+        job.error = ''
+        job.finished_at = timezone.now()
+
+    # Only record the outcome if this attempt still owns the job. A job
+    # requeued as stale may have been claimed by another worker since.
+    updated = Job.objects.filter(pk=job.pk, status=Job.RUNNING, attempts=job.attempts).update(
+        status=job.status,
+        result=job.result,
+        error=job.error,
+        run_after=job.run_after,
+        finished_at=job.finished_at,
+        updated_at=timezone.now(),
+    )
+    if not updated:
+        logger.warning("Job %s (%s) attempt %s was taken over, discarding its outcome", job.id, job.kind, job.attempts)
+    return job
+
+
+def requeue_stale() -> int:
+    """
+    Queue jobs again whose worker seems to have died mid-run.
+
+    Jobs that have used up their attempts are failed instead, so jobs that
+    must run once are never repeated and a job that always hangs stops.
+    Returns the number of jobs queued again.
+    """
+    timeout = getattr(settings, 'JOB_TIMEOUT', 600)
+    now = timezone.now()
+    stale = Job.objects.filter(status=Job.RUNNING, started_at__lt=now - timedelta(seconds=timeout))
+    with transaction.atomic():
+        stale.filter(attempts__gte=F('max_attempts')).update(
+            status=Job.FAILED,
+            error=f'Timed out after {timeout} seconds',
+            finished_at=now,
+            updated_at=now,
+        )
+        return stale.filter(attempts__lt=F('max_attempts')).update(
+            status=Job.QUEUED,
+            run_after=now,
+            updated_at=now,
+        )
+
+
+def work(burst=False, poll_interval=None):
+    """
+    Run jobs until stopped, or until none are due when burst is set.
+
+    Returns the number of jobs run.
+    """
+    poll_interval = getattr(settings, 'JOB_POLL_INTERVAL', 1) if poll_interval is None else poll_interval
+    count = 0
+    while True:
+        # Drop connections the database closed while we were idle or busy
+        close_old_connections()
+        try:
+            requeue_stale()
+            job = claim()
+        except Exception:
+            # A database hiccup must not take the worker down, poll again
+            logger.exception("Could not claim a job, retrying in %s seconds", poll_interval)
+            job = None
+        if job is None:
+            if burst:
+                return count
+            time.sleep(poll_interval)
+            continue
+        run(job)
+        count += 1
+
+
+### Job handlers
+# Conversation and email jobs are not safe to repeat, they run once.
+
+@handler('start_conversation', max_attempts=1)
+async def start_conversation(system, request):
+    conversation = await assistant.start_conversation(system, request)
+    return {'conversation_id': str(conversation.id)}
+
+
+@handler('send_message', max_attempts=1)
+async def send_message(conversation_id, request):
+    conversation = await AssistantConversation.objects.aget(pk=conversation_id)
+    message = await assistant.send_message(conversation, request)
+    return {'conversation_id': conversation_id, 'message_id': str(message.id)}
+
+
+@handler('copy_edit')
+async def copy_edit(text, editor_type='spotify', chunked=None):
+    return {'text': await assistant.copy_edit(text, editor_type, chunked)}
+
+
+@handler('send_test_calendar_email', max_attempts=1)
+def send_test_calendar_email():
+    from .calendar_service import CalendarService
+
+    return {'sent': CalendarService().send_daily_email(force_send=True)}
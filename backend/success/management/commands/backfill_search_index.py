@@ -0,0 +1,38 @@
+"""
+Django management command to backfill and verify the search index.
+
+The index is maintained incrementally by database triggers, so this is only
+needed after loading data with triggers disabled, or to check for drift:
+python manage.py backfill_search_index --verify
+"""
+from django.core.management.base import BaseCommand, CommandError
+from success.search_index import backfill_search_index, verify_search_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the search index table from its source view'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Only compare the index against the source view, do not write',
+        )
+
+    def handle(self, *args, **options):
+        if not options['verify']:
+            upserted = backfill_search_index()
+            self.stdout.write(
+                self.style.SUCCESS(f'Backfilled {upserted} search index rows.')
+            )
+
+        drift = verify_search_index()
+        if not drift.clean:
+            raise CommandError(
+                f'Search index is out of sync: {drift.missing} missing, '
+                f'{drift.stale} stale, {drift.orphaned} orphaned rows.'
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS('Search index matches the source view.')
+        )
@@ -0,0 +1,19 @@
+"""
+Django management command to rebuild link popularity from click events.
+
+Popularity is maintained incrementally on every click, so this is only
+needed after changing LINK_POPULARITY_HALF_LIFE_DAYS. Clicks counted before
+click events were recorded are kept, decaying from when they were migrated.
+"""
+from django.core.management.base import BaseCommand
+from success.models import Link
+
+
+class Command(BaseCommand):
+    help = 'Recompute decayed link popularity from recorded clicks'
+
+    def handle(self, *args, **options):
+        updated = Link.objects.recompute_popularity()
+        self.stdout.write(
+            self.style.SUCCESS(f'Recomputed popularity for {updated} links.')
+        )
@@ -0,0 +1,24 @@
+"""
+Django management command to renew Google Calendar tokens before they expire.
+
+Access tokens last an hour, running this from cron more often than that keeps
+the daily email from ever refreshing a token on its own:
+*/15 * * * * cd /path/to/project && python manage.py refresh_calendar_tokens
+"""
+from django.core.management.base import BaseCommand, CommandError
+from success.calendar_service import CalendarService
+
+
+class Command(BaseCommand):
+    help = 'Refresh Google Calendar access tokens that are about to expire'
+
+    def handle(self, *args, **options):
+        refreshed, failed = CalendarService().refresh_tokens()
+        if failed:
+            raise CommandError(
+                f'Could not refresh tokens for: {", ".join(failed)}'
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Refreshed {len(refreshed)} calendar tokens.')
+        )
@@ -0,0 +1,30 @@
+"""
+Django management command to run background jobs.
+
+Run one or more of these next to the web server. Workers share the job
+table safely, so scale by starting more:
+python manage.py run_jobs
+"""
+from django.core.management.base import BaseCommand
+from success.jobs import work
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--burst',
+            action='store_true',
+            help='Exit once no jobs are due instead of waiting for more',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            help='Seconds to wait between polls when idle',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS('Waiting for jobs.'))
+        count = work(burst=options['burst'], poll_interval=options['poll_interval'])
+        self.stdout.write(self.style.SUCCESS(f'Ran {count} jobs.'))
@@ -0,0 +1,37 @@
+"""
+Django management command to sync the local calendar event store.
+
+The daily email syncs before it reads, running this ahead of time from cron
+keeps each sync down to a handful of changes:
+*/15 * * * * cd /path/to/project && python manage.py sync_calendars
+"""
+from django.core.management.base import BaseCommand, CommandError
+from success.calendar_service import CalendarService
+from success.models import CalendarSettings
+
+
+class Command(BaseCommand):
+    help = 'Sync events from every enabled Google calendar into the local event store'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Drop the sync tokens and download every event again',
+        )
+
+    def handle(self, *args, **options):
+        if options['full']:
+            CalendarSettings.objects.update(sync_token='')
+
+        timings = CalendarService().sync_calendars()
+        failed = [timing for timing in timings if timing.error]
+        if failed:
+            raise CommandError(
+                f'{len(failed)} of {len(timings)} calendars failed to sync: '
+                + ', '.join(timing.calendar_name for timing in failed)
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Synced {len(timings)} calendars.')
+        )
@@ -0,0 +1,139 @@
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations, models
+
+
+# Per-row index maintenance. Each source table passes its item type so the
+# planner only probes that branch of the source view by primary key.
+TRIGGERS_SQL = """
+CREATE VIEW success_search_index_source as (
+   SELECT 'link' as item_type, id as item_id,
+   "title" || ' ' || "url" || array_to_string("tags", ' ') as body,
+   to_tsvector('english', "title" || ' ' || "url" || ' ' || array_to_string("tags", ' ')) as body_vector,
+   "click_count" as click_count,
+   "created_at" as created_at
+   FROM success_link
+   UNION ALL
+   SELECT 'person' as item_type, id as item_id,
+   "name" || ' ' || "email" || ' ' || "team" || ' ' || "role" as body,
+   to_tsvector('english', "name" || ' ' || "email" || ' ' || "team" || ' ' || "role") as body_vector,
+   NULL as click_count,
+   "created_at" as created_at
+   FROM success_person
+   UNION ALL
+   SELECT 'project' as item_type, id as item_id,
+   "name" || ' ' || "description" as body,
+   to_tsvector('english', "name" || ' ' || "description") as body_vector,
+   NULL as click_count,
+   "created_at" as created_at
+   FROM success_project
+);
+
+CREATE FUNCTION success_search_index_sync() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        DELETE FROM success_search_index WHERE item_id = OLD.id;
+        RETURN OLD;
+    END IF;
+
+    INSERT INTO success_search_index (item_type, item_id, body, body_vector, click_count, created_at)
+    SELECT item_type, item_id, body, body_vector, click_count, created_at
+    FROM success_search_index_source
+    WHERE item_type = TG_ARGV[0] AND item_id = NEW.id
+    ON CONFLICT (item_id) DO UPDATE SET
+        item_type = EXCLUDED.item_type,
+        body = EXCLUDED.body,
+        body_vector = EXCLUDED.body_vector,
+        click_count = EXCLUDED.click_count,
+        created_at = EXCLUDED.created_at;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER success_link_search_index
+AFTER INSERT OR UPDATE OF "title", "url", "tags", "click_count", "created_at" OR DELETE ON success_link
+FOR EACH ROW EXECUTE FUNCTION success_search_index_sync('link');
+
+CREATE TRIGGER success_person_search_index
+AFTER INSERT OR UPDATE OF "name", "email", "team", "role", "created_at" OR DELETE ON success_person
+FOR EACH ROW EXECUTE FUNCTION success_search_index_sync('person');
+
+CREATE TRIGGER success_project_search_index
+AFTER INSERT OR UPDATE OF "name", "description", "created_at" OR DELETE ON success_project
+FOR EACH ROW EXECUTE FUNCTION success_search_index_sync('project');
+
+INSERT INTO success_search_index (item_type, item_id, body, body_vector, click_count, created_at)
+SELECT item_type, item_id, body, body_vector, click_count, created_at
+FROM success_search_index_source;
+"""
+
+DROP_TRIGGERS_SQL = """
+DROP TRIGGER success_project_search_index ON success_project;
+DROP TRIGGER success_person_search_index ON success_person;
+DROP TRIGGER success_link_search_index ON success_link;
+DROP FUNCTION success_search_index_sync();
+DROP VIEW success_search_index_source;
+"""
+
+MATERIALIZED_VIEW_SQL = """
+CREATE MATERIALIZED VIEW success_search_index as (
+   SELECT 'link' as item_type, id as item_id,
+   "title" || ' ' || "url" || array_to_string("tags", ' ') as body,
+   to_tsvector('english', "title" || ' ' || "url" || ' ' || array_to_string("tags", ' ')) as body_vector,
+   "click_count" as click_count,
+   "created_at" as created_at
+   FROM success_link
+   UNION
+   SELECT 'person' as item_type, id as item_id,
+   "name" || ' ' || "email" || ' ' || "team" || ' ' || "role" as body,
+   to_tsvector('english', "name" || ' ' || "email" || ' ' || "team" || ' ' || "role") as body_vector,
+   NULL as click_count,
+   "created_at" as created_at
+   FROM success_person
+   UNION
+   SELECT 'project' as item_type, id as item_id,
+   "name" || ' ' || "description" as body,
+   to_tsvector('english', "name" || ' ' || "description") as body_vector,
+   NULL as click_count,
+   "created_at" as created_at
+   FROM success_project
+);
+CREATE INDEX success_search_body_index ON success_search_index USING GIN (body_vector);
+CREATE UNIQUE INDEX ON success_search_index (item_id);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('success', '0022_alter_notificationsettings_email_time_and_more'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql="DROP MATERIALIZED VIEW success_search_index;",
+            reverse_sql=MATERIALIZED_VIEW_SQL,
+        ),
+        migrations.DeleteModel(
+            name='SearchIndex',
+        ),
+        migrations.CreateModel(
+            name='SearchIndex',
+            fields=[
+                ('item_type', models.CharField(max_length=200)),
+                ('item_id', models.UUIDField(primary_key=True, serialize=False)),
+                ('body', models.TextField()),
+                ('body_vector', django.contrib.postgres.search.SearchVectorField()),
+                ('click_count', models.PositiveIntegerField(blank=True, null=True)),
+                ('created_at', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'success_search_index',
+                'indexes': [django.contrib.postgres.indexes.GinIndex(fields=['body_vector'], name='success_search_body_index')],
+            },
+        ),
+        migrations.RunSQL(
+            sql=TRIGGERS_SQL,
+            reverse_sql=DROP_TRIGGERS_SQL,
+        ),
+    ]
@@ -0,0 +1,18 @@
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('success', '0023_search_index_table'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='searchindex',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['body'], name='success_search_body_trgm_index', opclasses=['gin_trgm_ops']),
+        ),
+    ]
@@ -0,0 +1,122 @@
+from django.db import migrations, models
+
+
+SOURCE_VIEW_SQL = """
+CREATE OR REPLACE VIEW success_search_index_source as (
+   SELECT 'link' as item_type, id as item_id,
+   "title" || ' ' || "url" || array_to_string("tags", ' ') as body,
+   to_tsvector('english', "title" || ' ' || "url" || ' ' || array_to_string("tags", ' ')) as body_vector,
+   "click_count" as click_count,
+   "created_at" as created_at,
+   "title" as title
+   FROM success_link
+   UNION ALL
+   SELECT 'person' as item_type, id as item_id,
+   "name" || ' ' || "email" || ' ' || "team" || ' ' || "role" as body,
+   to_tsvector('english', "name" || ' ' || "email" || ' ' || "team" || ' ' || "role") as body_vector,
+   NULL as click_count,
+   "created_at" as created_at,
+   "name" as title
+   FROM success_person
+   UNION ALL
+   SELECT 'project' as item_type, id as item_id,
+   "name" || ' ' || "description" as body,
+   to_tsvector('english', "name" || ' ' || "description") as body_vector,
+   NULL as click_count,
+   "created_at" as created_at,
+   "name" as title
+   FROM success_project
+);
+
+CREATE OR REPLACE FUNCTION success_search_index_sync() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        DELETE FROM success_search_index WHERE item_id = OLD.id;
+        RETURN OLD;
+    END IF;
+
+    INSERT INTO success_search_index (item_type, item_id, body, body_vector, click_count, created_at, title)
+    SELECT item_type, item_id, body, body_vector, click_count, created_at, title
+    FROM success_search_index_source
+    WHERE item_type = TG_ARGV[0] AND item_id = NEW.id
+    ON CONFLICT (item_id) DO UPDATE SET
+        item_type = EXCLUDED.item_type,
+        body = EXCLUDED.body,
+        body_vector = EXCLUDED.body_vector,
+        click_count = EXCLUDED.click_count,
+        created_at = EXCLUDED.created_at,
+        title = EXCLUDED.title;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+UPDATE success_search_index i SET title = s.title
+FROM success_search_index_source s
+WHERE s.item_id = i.item_id;
+"""
+
+REVERSE_SOURCE_VIEW_SQL = """
+DROP VIEW success_search_index_source;
+CREATE VIEW success_search_index_source as (
+   SELECT 'link' as item_type, id as item_id,
+   "title" || ' ' || "url" || array_to_string("tags", ' ') as body,
+   to_tsvector('english', "title" || ' ' || "url" || ' ' || array_to_string("tags", ' ')) as body_vector,
+   "click_count" as click_count,
+   "created_at" as created_at
+   FROM success_link
+   UNION ALL
+   SELECT 'person' as item_type, id as item_id,
+   "name" || ' ' || "email" || ' ' || "team" || ' ' || "role" as body,
+   to_tsvector('english', "name" || ' ' || "email" || ' ' || "team" || ' ' || "role") as body_vector,
+   NULL as click_count,
+   "created_at" as created_at
+   FROM success_person
+   UNION ALL
+   SELECT 'project' as item_type, id as item_id,
+   "name" || ' ' || "description" as body,
+   to_tsvector('english', "name" || ' ' || "description") as body_vector,
+   NULL as click_count,
+   "created_at" as created_at
+   FROM success_project
+);
+
+CREATE OR REPLACE FUNCTION success_search_index_sync() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        DELETE FROM success_search_index WHERE item_id = OLD.id;
+        RETURN OLD;
+    END IF;
+
+    INSERT INTO success_search_index (item_type, item_id, body, body_vector, click_count, created_at)
+    SELECT item_type, item_id, body, body_vector, click_count, created_at
+    FROM success_search_index_source
+    WHERE item_type = TG_ARGV[0] AND item_id = NEW.id
+    ON CONFLICT (item_id) DO UPDATE SET
+        item_type = EXCLUDED.item_type,
+        body = EXCLUDED.body,
+        body_vector = EXCLUDED.body_vector,
+        click_count = EXCLUDED.click_count,
+        created_at = EXCLUDED.created_at;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('success', '0024_search_index_trigram'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='searchindex',
+            name='title',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.RunSQL(
+            sql=SOURCE_VIEW_SQL,
+            reverse_sql=REVERSE_SOURCE_VIEW_SQL,
+        ),
+    ]
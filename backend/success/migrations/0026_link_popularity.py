@@ -0,0 +1,175 @@
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+SOURCE_VIEW_SQL = """
+CREATE OR REPLACE VIEW success_search_index_source as (
+   SELECT 'link' as item_type, id as item_id,
+   "title" || ' ' || "url" || array_to_string("tags", ' ') as body,
+   to_tsvector('english', "title" || ' ' || "url" || ' ' || array_to_string("tags", ' ')) as body_vector,
+   "click_count" as click_count,
+   "created_at" as created_at,
+   "title" as title,
+   "popularity" as popularity,
+   "popularity_updated_at" as popularity_updated_at
+   FROM success_link
+   UNION ALL
+   SELECT 'person' as item_type, id as item_id,
+   "name" || ' ' || "email" || ' ' || "team" || ' ' || "role" as body,
+   to_tsvector('english', "name" || ' ' || "email" || ' ' || "team" || ' ' || "role") as body_vector,
+   NULL as click_count,
+   "created_at" as created_at,
+   "name" as title,
+   NULL as popularity,
+   NULL as popularity_updated_at
+   FROM success_person
+   UNION ALL
+   SELECT 'project' as item_type, id as item_id,
+   "name" || ' ' || "description" as body,
+   to_tsvector('english', "name" || ' ' || "description") as body_vector,
+   NULL as click_count,
+   "created_at" as created_at,
+   "name" as title,
+   NULL as popularity,
+   NULL as popularity_updated_at
+   FROM success_project
+);
+
+CREATE OR REPLACE FUNCTION success_search_index_sync() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        DELETE FROM success_search_index WHERE item_id = OLD.id;
+        RETURN OLD;
+    END IF;
+
+    INSERT INTO success_search_index (item_type, item_id, body, body_vector, click_count, created_at, title, popularity, popularity_updated_at)
+    SELECT item_type, item_id, body, body_vector, click_count, created_at, title, popularity, popularity_updated_at
+    FROM success_search_index_source
+    WHERE item_type = TG_ARGV[0] AND item_id = NEW.id
+    ON CONFLICT (item_id) DO UPDATE SET
+        item_type = EXCLUDED.item_type,
+        body = EXCLUDED.body,
+        body_vector = EXCLUDED.body_vector,
+        click_count = EXCLUDED.click_count,
+        created_at = EXCLUDED.created_at,
+        title = EXCLUDED.title,
+        popularity = EXCLUDED.popularity,
+        popularity_updated_at = EXCLUDED.popularity_updated_at;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER success_link_search_index ON success_link;
+CREATE TRIGGER success_link_search_index
+AFTER INSERT OR UPDATE OF "title", "url", "tags", "click_count", "popularity", "popularity_updated_at", "created_at" OR DELETE ON success_link
+FOR EACH ROW EXECUTE FUNCTION success_search_index_sync('link');
+
+UPDATE success_search_index i SET popularity = s.popularity, popularity_updated_at = s.popularity_updated_at
+FROM success_search_index_source s
+WHERE s.item_id = i.item_id;
+"""
+
+REVERSE_SOURCE_VIEW_SQL = """
+DROP TRIGGER success_link_search_index ON success_link;
+CREATE TRIGGER success_link_search_index
+AFTER INSERT OR UPDATE OF "title", "url", "tags", "click_count", "created_at" OR DELETE ON success_link
+FOR EACH ROW EXECUTE FUNCTION success_search_index_sync('link');
+
+DROP VIEW success_search_index_source;
+
+CREATE VIEW success_search_index_source as (
+   SELECT 'link' as item_type, id as item_id,
+   "title" || ' ' || "url" || array_to_string("tags", ' ') as body,
+   to_tsvector('english', "title" || ' ' || "url" || ' ' || array_to_string("tags", ' ')) as body_vector,
+   "click_count" as click_count,
+   "created_at" as created_at,
+   "title" as title
+   FROM success_link
+   UNION ALL
+   SELECT 'person' as item_type, id as item_id,
+   "name" || ' ' || "email" || ' ' || "team" || ' ' || "role" as body,
+   to_tsvector('english', "name" || ' ' || "email" || ' ' || "team" || ' ' || "role") as body_vector,
+   NULL as click_count,
+   "created_at" as created_at,
+   "name" as title
+   FROM success_person
+   UNION ALL
+   SELECT 'project' as item_type, id as item_id,
+   "name" || ' ' || "description" as body,
+   to_tsvector('english', "name" || ' ' || "description") as body_vector,
+   NULL as click_count,
+   "created_at" as created_at,
+   "name" as title
+   FROM success_project
+);
+
+CREATE OR REPLACE FUNCTION success_search_index_sync() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        DELETE FROM success_search_index WHERE item_id = OLD.id;
+        RETURN OLD;
+    END IF;
+
+    INSERT INTO success_search_index (item_type, item_id, body, body_vector, click_count, created_at, title)
+    SELECT item_type, item_id, body, body_vector, click_count, created_at, title
+    FROM success_search_index_source
+    WHERE item_type = TG_ARGV[0] AND item_id = NEW.id
+    ON CONFLICT (item_id) DO UPDATE SET
+        item_type = EXCLUDED.item_type,
+        body = EXCLUDED.body,
+        body_vector = EXCLUDED.body_vector,
+        click_count = EXCLUDED.click_count,
+        created_at = EXCLUDED.created_at,
+        title = EXCLUDED.title;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('success', '0025_searchindex_title'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='link',
+            name='popularity',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='link',
+            name='popularity_updated_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.CreateModel(
+            name='LinkClick',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clicked_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('link', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='clicks', to='success.link')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='searchindex',
+            name='popularity',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='searchindex',
+            name='popularity_updated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        # Lifetime clicks have no timestamps, start them decaying from now
+        migrations.RunSQL(
+            sql='UPDATE success_link SET popularity = click_count;',
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.RunSQL(
+            sql=SOURCE_VIEW_SQL,
+            reverse_sql=REVERSE_SOURCE_VIEW_SQL,
+        ),
+    ]
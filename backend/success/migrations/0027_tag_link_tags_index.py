@@ -0,0 +1,73 @@
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+# Keep per-tag link counts in step with success_link.tags. A link counts
+# once per tag, however often the tag repeats in its array.
+TAG_TRIGGER_SQL = """
+CREATE FUNCTION success_tag_sync() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND OLD.tags IS NOT DISTINCT FROM NEW.tags THEN
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE success_tag SET link_count = link_count - 1
+        WHERE name IN (SELECT unnest(OLD.tags));
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO success_tag (name, link_count)
+        SELECT DISTINCT tag, 1 FROM unnest(NEW.tags) AS tag
+        ON CONFLICT (name) DO UPDATE SET link_count = success_tag.link_count + 1;
+    END IF;
+
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        DELETE FROM success_tag
+        WHERE link_count <= 0 AND name IN (SELECT unnest(OLD.tags));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER success_link_tags
+AFTER INSERT OR UPDATE OF "tags" OR DELETE ON success_link
+FOR EACH ROW EXECUTE FUNCTION success_tag_sync();
+
+INSERT INTO success_tag (name, link_count)
+SELECT tag, COUNT(DISTINCT id) FROM success_link, unnest(tags) AS tag
+GROUP BY tag;
+"""
+
+DROP_TAG_TRIGGER_SQL = """
+DROP TRIGGER success_link_tags ON success_link;
+DROP FUNCTION success_tag_sync();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('success', '0026_link_popularity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('name', models.CharField(primary_key=True, serialize=False)),
+                ('link_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='link',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['tags'], name='success_link_tags_index'),
+        ),
+        migrations.RunSQL(
+            sql=TAG_TRIGGER_SQL,
+            reverse_sql=DROP_TAG_TRIGGER_SQL,
+        ),
+    ]
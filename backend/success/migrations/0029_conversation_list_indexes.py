@@ -0,0 +1,19 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('success', '0028_link_created_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='assistantconversation',
+            index=models.Index(fields=['created_at', 'id'], name='success_conversation_created'),
+        ),
+        migrations.AddIndex(
+            model_name='assistantmessage',
+            index=models.Index(fields=['conversation', 'created_at'], name='success_message_created'),
+        ),
+    ]
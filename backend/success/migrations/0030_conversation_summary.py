@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('success', '0029_conversation_list_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='assistantconversation',
+            name='summary',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='assistantconversation',
+            name='summarized_message_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,27 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('success', '0030_conversation_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AssistantUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('conversation', 'Conversation'), ('summary', 'Summary'), ('copy_edit', 'Copy edit')], max_length=20)),
+                ('model_name', models.CharField(blank=True, max_length=100)),
+                ('input_tokens', models.PositiveIntegerField(default=0)),
+                ('output_tokens', models.PositiveIntegerField(default=0)),
+                ('cache_read_tokens', models.PositiveIntegerField(default=0)),
+                ('cache_creation_tokens', models.PositiveIntegerField(default=0)),
+                ('duration_ms', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('conversation', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='usage', to='success.assistantconversation')),
+            ],
+        ),
+    ]
@@ -0,0 +1,23 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('success', '0031_assistant_usage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CopyEditCacheEntry',
+            fields=[
+                ('key', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('editor_type', models.CharField(max_length=50)),
+                ('model_name', models.CharField(blank=True, max_length=100)),
+                ('result', models.TextField()),
+                ('hits', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('last_used_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+    ]
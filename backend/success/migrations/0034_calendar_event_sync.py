@@ -0,0 +1,43 @@
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('success', '0033_job_queue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='calendarsettings',
+            name='sync_token',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='calendarsettings',
+            name='synced_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='CalendarEvent',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('hidden', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('event_id', models.CharField(max_length=1024)),
+                ('event_type', models.CharField(blank=True, max_length=50)),
+                ('start', models.DateTimeField()),
+                ('end', models.DateTimeField()),
+                ('all_day', models.BooleanField(default=False)),
+                ('data', models.JSONField()),
+                ('calendar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='success.calendarsettings')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['calendar', 'start'], name='success_calendar_event_start')],
+                'unique_together': {('calendar', 'event_id')},
+            },
+        ),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('success', '0034_calendar_event_sync'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='calendarsettings',
+            name='synced_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,24 +1,28 @@
-from typing import List
+import re
 import uuid
 import math
 from datetime import time
 
 from django.utils.translation import gettext_lazy as _
 from django.db import models, connection, transaction
-from django.db.models import Count, F, Func, Q, Case, When, Value, IntegerField
-from django.db.models.functions import Ln, Coalesce
-from django.db.models.signals import post_save
+from django.conf import settings
+from django.db.models import Count, F, Func, Q, Case, When, Value, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Ln, Coalesce, Greatest, Left, Now
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.models.lookups import IContains
+from django.utils import timezone
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.contrib.postgres.fields import ArrayField
-from django.contrib.postgres.search import SearchVectorField, SearchVector, SearchQuery, SearchRank
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField, SearchVector, SearchQuery, SearchRank, TrigramWordSimilarity
 from ordered_model.models import OrderedModel
 from solo.models import SingletonModel
+from .search_cache import search_cache
 import logging
 
 from collections import defaultdict
 
-import itertools
-
 class SuccessModel(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     hidden = models.BooleanField(default=False)
@@ -30,9 +34,79 @@ class SuccessModel(models.Model):
         abstract = True
 
 
+def popularity_half_life():
+    """Seconds for a click's weight in link popularity to halve"""
+    return getattr(settings, 'LINK_POPULARITY_HALF_LIFE_DAYS', 30) * 24 * 60 * 60
+
+class DecayedScore(Func):
+    """
+    A score stored at updated_at, decayed to now in SQL:
+    score * 0.5 ^ (seconds since updated_at / half_life)
+    """
+    output_field = models.FloatField()
+
+    def __init__(self, score, updated_at, half_life, **extra):
+        super().__init__(score, updated_at, Value(float(half_life)), **extra)
+
+    def as_sql(self, compiler, connection, **extra_context):
+        (score, score_params), (updated_at, updated_at_params), (half_life, half_life_params) = (
+            compiler.compile(expression) for expression in self.get_source_expressions()
+        )
+        sql = f"({score} * power(0.5, extract(epoch from (now() - {updated_at})) / {half_life}))"
+        return sql, (*score_params, *updated_at_params, *half_life_params)
+
 class LinkManager(models.Manager):
     def unique_tags(self):
-        return self.annotate(elems=Func(F('tags'), function='unnest')).values_list('elems', flat=True).distinct()
+        return Tag.objects.values_list('name', flat=True)
+
+    def record_click(self, link_id):
+        """
+        Count a click with a single UPDATE ... SET click_count = click_count + 1.
+        The increment happens in the database, so concurrent clicks from any
+        worker are never lost, and no post_save signals fire.
+
+        Popularity is folded in the same statement: the stored score is
+        decayed from its last update to now, then the new click adds 1.
+        """
+        with transaction.atomic():
+            updated = self.filter(pk=link_id).update(
+                click_count=F('click_count') + 1,
+                popularity=DecayedScore(F('popularity'), F('popularity_updated_at'), popularity_half_life()) + Value(1.0),
+                popularity_updated_at=Now(),
+            )
+            if not updated:
+                raise self.model.DoesNotExist(f"Link {link_id} does not exist")
+            LinkClick.objects.create(link_id=link_id)
+        return self.get(pk=link_id)
+
+    def recompute_popularity(self):
+        """
+        Rebuild every link's popularity from its click events, e.g. after
+        changing the half-life. Clicks from before events were recorded (the
+        part of click_count with no event) have no timestamps, they decay
+        from when migration 0026 seeded popularity with them.
+        """
+        decayed_clicks = LinkClick.objects.filter(link=OuterRef('pk')).annotate(
+            weight=DecayedScore(Value(1.0), F('clicked_at'), popularity_half_life())
+        ).values('link').annotate(total=Sum('weight')).values('total')
+        recorded_clicks = LinkClick.objects.filter(link=OuterRef('pk')).values('link').annotate(
+            total=Count('pk')
+        ).values('total')
+        seeded_at = MigrationRecorder(connection).migration_qs.filter(
+            app='success', name='0026_link_popularity'
+        ).values_list('applied', flat=True).first() or timezone.now()
+        legacy_clicks = Greatest(
+            F('click_count') - Coalesce(Subquery(recorded_clicks, output_field=models.IntegerField()), Value(0)),
+            Value(0),
+        )
+
+        return self.update(
+            popularity=(
+                Coalesce(Subquery(decayed_clicks, output_field=models.FloatField()), Value(0.0))
+                + DecayedScore(legacy_clicks, Value(seeded_at), popularity_half_life())
+            ),
+            popularity_updated_at=Now(),
+        )
 
 class Link(SuccessModel):
     url = models.CharField()
@@ -40,9 +114,35 @@ class Link(SuccessModel):
     description = models.CharField(blank=True)
     tags = ArrayField(models.CharField(), blank=True)
     click_count = models.PositiveIntegerField(default=0)
+    # Exponentially decayed click count as of popularity_updated_at
+    popularity = models.FloatField(default=0)
+    popularity_updated_at = models.DateTimeField(default=timezone.now)
 
     objects = LinkManager()
 
+    class Meta:
+        indexes = [
+            GinIndex(fields=['tags'], name='success_link_tags_index'),
+            models.Index(fields=['created_at', 'id'], name='success_link_created_index'),
+        ]
+
+class Tag(models.Model):
+    """Every tag in use with the number of links carrying it, maintained by
+    a database trigger on success_link (migration 0027)."""
+    name = models.CharField(primary_key=True)
+    link_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['name']
+
+class LinkClick(models.Model):
+    link = models.ForeignKey(
+        Link,
+        related_name='clicks',
+        on_delete=models.CASCADE
+    )
+    clicked_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
 class Person(SuccessModel):
     name = models.CharField()
     email = models.CharField()
@@ -71,20 +171,72 @@ class Project(SuccessModel, OrderedModel):
     class Meta:
         ordering = ['order']
 
+SEARCH_MODELS = {
+    'link': Link,
+    'person': Person,
+    'project': Project,
+}
+
+# Substring matches the query anywhere in the body with ILIKE, trigram
+# matches words that are similar to the query (pg_trgm word_similarity).
+# Both are served by the trigram GIN index on body.
+SEARCH_MODE_SUBSTRING = 'substring'
+SEARCH_MODE_TRIGRAM = 'trigram'
+
+@models.TextField.register_lookup
+class ILikeContains(IContains):
+    """
+    Case insensitive substring match written as a bare "body ILIKE '%q%'".
+    Django's icontains compiles to UPPER(body::text) LIKE UPPER(...), which a
+    gin_trgm_ops index on the plain column cannot serve.
+    """
+    lookup_name = 'ilike_contains'
+
+    def as_postgresql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} ILIKE {rhs}', (*lhs_params, *rhs_params)
+
 class SearchIndexManager(models.Manager):
-    def search(self, query, item_type = None, order = None):
+    def matching(self, query, item_type = None, mode = None):
         search_query = SearchQuery(query, search_type='websearch')
-        objects = SearchIndex.objects.filter(Q(body_vector=search_query) | Q(body__icontains=query))
+        if mode == SEARCH_MODE_TRIGRAM:
+            partial_match = Q(body__trigram_word_similar=query)
+        else:
+            partial_match = Q(body__ilike_contains=query)
+        objects = self.filter(Q(body_vector=search_query) | partial_match)
         
         if item_type:
             objects = objects.filter(item_type=item_type)
 
+        return objects
+
+    def search(self, query, item_type = None, order = None, limit = None, offset = 0, mode = None):
+        order_key = (order.field, order.direction) if order else None
+        key = ('search', query, item_type, order_key, limit, offset, mode)
+        return list(search_cache.get_or_set(key, lambda: self._search(query, item_type, order, limit, offset, mode)))
+
+    def search_count(self, query, item_type = None, mode = None):
+        key = ('search_count', query, item_type, mode)
+        return search_cache.get_or_set(key, lambda: self.matching(query, item_type, mode).count())
+
+    def _search(self, query, item_type, order, limit, offset, mode):
+        search_query = SearchQuery(query, search_type='websearch')
+        objects = self.matching(query, item_type, mode)
+
+        search_rank = SearchRank(F('body_vector'), search_query)
+        if mode == SEARCH_MODE_TRIGRAM:
+            # Let close partial matches outrank weak full text matches
+            search_rank = search_rank + TrigramWordSimilarity(query, 'body')
+
         # Default ranking with click count boost
         objects = objects.annotate(
-            search_rank=SearchRank(F('body_vector'), search_query),
-            # Logarithmic click count boost for links only (NULL for others becomes 0)
+            search_rank=search_rank,
+            # Logarithmic boost from recent clicks, for links only (NULL for others becomes 0)
             click_boost=Case(
-                When(item_type='link', then=Ln(F('click_count') + Value(1)) * Value(0.1)),
+                When(item_type='link', then=Ln(
+                    DecayedScore(F('popularity'), F('popularity_updated_at'), popularity_half_life()) + Value(1.0)
+                ) * Value(0.1)),
                 default=Value(0),
                 output_field=models.FloatField()
             )
@@ -94,39 +246,54 @@ class SearchIndexManager(models.Manager):
         if order:
             # Primary: explicit order, Secondary: search quality as tie-breakers  
             order_direction = '-' if order.sort_order() else ''
-            objects = objects.order_by(f'{order_direction}{order.field}', '-search_rank', '-click_boost')
+            objects = objects.order_by(f'{order_direction}{order.field}', '-search_rank', '-click_boost', 'item_id')
         else:
             # Default: search quality first
-            objects = objects.order_by('-search_rank', '-click_boost')
+            objects = objects.order_by('-search_rank', '-click_boost', 'item_id')
+
+        # Page in SQL, the id tie-breaker above keeps pages stable
+        if limit is not None:
+            objects = objects[offset:offset + limit]
+        elif offset:
+            objects = objects[offset:]
             
         # Database query happens here, raising the lazy search query.
-        search_results = list(objects) 
+        search_results = list(objects.values_list('item_type', 'item_id'))
 
+        # Sort ids into type to query
+        grouped_ids = defaultdict(list)
+        for result_type, item_id in search_results:
+            grouped_ids[result_type].append(item_id)
 
-        # Sort objects into type to query
-        grouped_objects = defaultdict(list)
-        for obj in search_results:
-            grouped_objects[obj.item_type].append(obj)
-        
-        # get the full objects
-        def find_objects(items: List[SearchIndex], model_class):
-            item_ids = map(lambda x: x.item_id, items)
+        # get the full objects, one query per type that has hits
+        retrieved_objects = {}
+        for result_type, item_ids in grouped_ids.items():
+            retrieved_objects.update(SEARCH_MODELS[result_type].objects.in_bulk(item_ids))
 
-            return model_class.objects.filter(pk__in=list(item_ids))
-        
-        # Join the 3 search types together
-        retrieved_objects = itertools.chain(find_objects(grouped_objects['link'], Link), find_objects(grouped_objects['person'], Person), find_objects(grouped_objects['project'], Project))
-        
-        retrieved_objects = list(retrieved_objects)
-        
-        
         # return in the order of the search results
-        def find_by_id(object):
-            return next(x for x in retrieved_objects if x.id == object.item_id)
-        
-        enriched_objects = list(map(find_by_id, search_results))
+        return [retrieved_objects[item_id] for _, item_id in search_results if item_id in retrieved_objects]
+
+    def typeahead(self, query, item_type = None, limit = 10):
+        """
+        Prefix match every word of a partially typed query, e.g. "mik se" as
+        mik:* & se:*. Returns plain rows straight from the index, without
+        loading the underlying objects.
+        """
+        terms = re.findall(r'\w+', query)
+        if not terms:
+            return []
+
+        search_query = SearchQuery(' & '.join(f'{term}:*' for term in terms), search_type='raw', config='english')
+        objects = self.filter(body_vector=search_query)
+
+        if item_type:
+            objects = objects.filter(item_type=item_type)
+
+        objects = objects.annotate(
+            search_rank=SearchRank(F('body_vector'), search_query)
+        ).order_by('-search_rank', 'item_id')
 
-        return enriched_objects
+        return list(objects.values('item_id', 'item_type', 'title')[:limit])
 
 class SearchIndex(models.Model):
     item_type = models.CharField(max_length=200)
@@ -135,24 +302,61 @@ class SearchIndex(models.Model):
     body_vector = SearchVectorField()
     click_count = models.PositiveIntegerField(null=True, blank=True)
     created_at = models.DateTimeField()
+    title = models.TextField(blank=True, default='')
+    popularity = models.FloatField(null=True, blank=True)
+    popularity_updated_at = models.DateTimeField(null=True, blank=True)
 
     objects = SearchIndexManager()
     
     class Meta:
-        managed = False
+        # Rows are upserted by database triggers on the source tables,
+        # see migration 0023_search_index_table.
         db_table = 'success_search_index'
+        indexes = [
+            GinIndex(fields=['body_vector'], name='success_search_body_index'),
+            GinIndex(fields=['body'], opclasses=['gin_trgm_ops'], name='success_search_body_trgm_index'),
+        ]
 
 class PromptTemplate(SuccessModel):
     name = models.CharField()
     system_message = models.TextField()
     request_template = models.TextField()
 
+PREVIEW_LENGTH = 50
+
+
+class AssistantConversationQuerySet(models.QuerySet):
+    def with_summary(self):
+        """Annotate the latest message and the preview text so listing needs no query per row"""
+        messages = AssistantMessage.objects.filter(conversation=OuterRef('pk'))
+        latest = messages.order_by('-created_at', '-id')
+        # One character past the preview length is enough to know whether to add an ellipsis
+        first_user = messages.filter(role='user').order_by('created_at', 'id').annotate(
+            preview=Left('content', PREVIEW_LENGTH + 1),
+        )
+        return self.annotate(
+            latest_message_id=Subquery(latest.values('id')[:1]),
+            latest_message_role=Subquery(latest.values('role')[:1]),
+            latest_message_content=Subquery(latest.values('content')[:1]),
+            latest_message_created_at=Subquery(latest.values('created_at')[:1]),
+            preview_content=Subquery(first_user.values('preview')[:1]),
+        )
+
+
 class AssistantConversation(SuccessModel):
     system_message = models.TextField(blank=True)
     description = models.TextField(blank=True)
+    # Rolling summary of the oldest messages, which are no longer sent verbatim
+    summary = models.TextField(blank=True)
+    summarized_message_count = models.PositiveIntegerField(default=0)
+
+    objects = AssistantConversationQuerySet.as_manager()
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='success_conversation_created'),
+        ]
     
     @property
     def messages(self):
@@ -160,12 +364,28 @@ class AssistantConversation(SuccessModel):
     
     @property
     def latest_message(self):
-        return self.assistant_messages.order_by('-created_at').first()
+        if 'latest_message_id' not in self.__dict__:
+            return self.assistant_messages.order_by('-created_at').first()
+        if self.latest_message_id is None:
+            return None
+        return AssistantMessage(
+            id=self.latest_message_id,
+            conversation=self,
+            role=self.latest_message_role,
+            content=self.latest_message_content,
+            created_at=self.latest_message_created_at,
+        )
     
     @property
     def preview_text(self):
-        first_user_message = self.assistant_messages.filter(role='user').first()
-        return first_user_message.content[:50] + '...' if first_user_message and len(first_user_message.content) > 50 else first_user_message.content if first_user_message else 'Empty conversation'
+        if 'preview_content' in self.__dict__:
+            content = self.preview_content
+        else:
+            first_user_message = self.assistant_messages.filter(role='user').first()
+            content = first_user_message.content if first_user_message else None
+        if content is None:
+            return 'Empty conversation'
+        return content[:PREVIEW_LENGTH] + '...' if len(content) > PREVIEW_LENGTH else content
 
 class AssistantMessage(SuccessModel):
     ROLE_CHOICES = [
@@ -183,6 +403,95 @@ class AssistantMessage(SuccessModel):
     
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['conversation', 'created_at'], name='success_message_created'),
+        ]
+
+
+class AssistantUsageManager(models.Manager):
+    def totals(self, since=None):
+        """Token totals per kind of call, with the share of input read from the prompt cache"""
+        usage = self.all()
+        if since:
+            usage = usage.filter(created_at__gte=since)
+        return usage.values('kind').annotate(
+            calls=Count('id'),
+            input_tokens=Sum('input_tokens'),
+            output_tokens=Sum('output_tokens'),
+            cache_read_tokens=Sum('cache_read_tokens'),
+            cache_creation_tokens=Sum('cache_creation_tokens'),
+            duration_ms=Sum('duration_ms'),
+        ).order_by('kind')
+
+
+class AssistantUsage(models.Model):
+    """Token usage of a single LLM call"""
+    KIND_CHOICES = [
+        ('conversation', 'Conversation'),
+        ('summary', 'Summary'),
+        ('copy_edit', 'Copy edit'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    conversation = models.ForeignKey(
+        AssistantConversation,
+        related_name='usage',
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL
+    )
+    model_name = models.CharField(max_length=100, blank=True)
+    # input_tokens includes the cached tokens, as reported by the provider
+    input_tokens = models.PositiveIntegerField(default=0)
+    output_tokens = models.PositiveIntegerField(default=0)
+    cache_read_tokens = models.PositiveIntegerField(default=0)
+    cache_creation_tokens = models.PositiveIntegerField(default=0)
+    duration_ms = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    objects = AssistantUsageManager()
+
+
+class CopyEditCacheEntry(models.Model):
+    """A copy edit result, keyed on a hash of everything that produced it"""
+    key = models.CharField(max_length=64, primary_key=True)
+    editor_type = models.CharField(max_length=50)
+    model_name = models.CharField(max_length=100, blank=True)
+    result = models.TextField()
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    last_used_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+
+class Job(SuccessModel):
+    """A unit of background work, claimed by manage.py run_jobs workers"""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Workers only ever look for queued jobs that are due
+            models.Index(fields=['run_after'], condition=Q(status='queued'), name='success_job_queued_index'),
+        ]
 
 
 class ScratchPad(SingletonModel):
@@ -211,11 +520,37 @@ class CalendarSettings(SuccessModel):
     calendar_id = models.CharField(max_length=200)
     calendar_name = models.CharField(max_length=200, blank=True)
     is_enabled = models.BooleanField(default=True)
+    # Google's token for fetching only what changed since the last sync
+    sync_token = models.TextField(blank=True)
+    synced_at = models.DateTimeField(null=True, blank=True)
+    # End of the window the last full sync covered
+    synced_until = models.DateTimeField(null=True, blank=True)
     
     class Meta:
         unique_together = ['google_credentials', 'calendar_id']
         verbose_name_plural = "Calendar Settings"
 
+class CalendarEvent(SuccessModel):
+    """Local copy of a Google Calendar event, kept current by incremental sync"""
+    calendar = models.ForeignKey(
+        CalendarSettings,
+        on_delete=models.CASCADE,
+        related_name='events'
+    )
+    event_id = models.CharField(max_length=1024)
+    event_type = models.CharField(max_length=50, blank=True)
+    start = models.DateTimeField()
+    end = models.DateTimeField()
+    all_day = models.BooleanField(default=False)
+    # The event as the Calendar API returned it
+    data = models.JSONField()
+    
+    class Meta:
+        unique_together = ['calendar', 'event_id']
+        indexes = [
+            models.Index(fields=['calendar', 'start'], name='success_calendar_event_start'),
+        ]
+
 class NotificationSettings(SingletonModel):
     """Global notification preferences"""
     daily_email_enabled = models.BooleanField(default=False)
@@ -244,10 +579,15 @@ logger = logging.getLogger(__name__)
 @receiver(post_save, sender=Link)
 @receiver(post_save, sender=Person)
 @receiver(post_save, sender=Project)
-def update_view(sender, **kwargs):
-    with connection.cursor() as cursor:
-        cursor.execute("REFRESH MATERIALIZED VIEW CONCURRENTLY success_search_index;")
-    logger.info("Reindexed the database.")
+@receiver(post_delete, sender=Link)
+@receiver(post_delete, sender=Person)
+@receiver(post_delete, sender=Project)
+def invalidate_search_cache(sender, **kwargs):
+    # The index row is already updated by trigger. Invalidate now for this
+    # request and again on commit, so readers that cached pre-commit results
+    # in between don't keep them.
+    search_cache.invalidate()
+    transaction.on_commit(search_cache.invalidate)
 
 # System Stuff ----
 
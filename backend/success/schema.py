@@ -2,17 +2,75 @@ import strawberry
 import strawberry_django
 
 from strawberry_django import mutations
+from strawberry_django.optimizer import DjangoOptimizerExtension
+from strawberry.types import Info
+from django.db import connections
+from django.db.models import Q
+from asgiref.sync import sync_to_async
 
 from typing import List, Union, Optional, Dict
-from .types import Link, LinkInput, Person, PersonInput, PersonLog, PersonLogInput, Project, ProjectInput, AssistantConversation, AssistantMessage, ScratchPad, ProjectPartialInput, PromptTemplate, PromptTemplateInput, SystemLog, SearchOrder, GoogleCredentials, CalendarSettings, NotificationSettings, CalendarEmailLog, NotificationSettingsInput, CalendarSettingsInput, GoogleOAuthInput
+from .types import Link, LinkInput, LinkFilter, LinkConnection, encode_link_cursor, decode_link_cursor, Tag, Person, PersonInput, PersonLog, PersonLogInput, Project, ProjectInput, AssistantConversation, AssistantConversationConnection, encode_conversation_cursor, decode_conversation_cursor, AssistantMessage, ScratchPad, ProjectPartialInput, PromptTemplate, PromptTemplateInput, SystemLog, SearchOrder, SearchConnection, PageInfo, SearchCacheStats, CopyEditCacheStats, AssistantUsageStats, TypeaheadResult, encode_search_cursor, decode_search_cursor, GoogleCredentials, CalendarSettings, NotificationSettings, CalendarEmailLog, NotificationSettingsInput, CalendarSettingsInput, GoogleOAuthInput, Job
 from . import models
 from . import assistant
+from . import copy_edit_cache
+from . import jobs
+from .search_cache import search_cache
 import uuid
+import datetime
+
+
+async def run_blocking(func, *args, **kwargs):
+    """
+    Run slow blocking work, like Google API and LLM calls, on a thread of its own.
+
+    Sync resolvers and the async ORM all share one thread per worker, so a
+    call that waits seconds on Google there stalls every other request.
+    """
+    def call():
+        try:
+            return func(*args, **kwargs)
+        finally:
+            # Request teardown only closes the shared thread's connections
+            connections.close_all()
+    return await sync_to_async(call, thread_sensitive=False)()
+
+
+SEARCH_PAGE_SIZE = 50
+MAX_SEARCH_PAGE_SIZE = 200
+MAX_TYPEAHEAD_RESULTS = 20
+LINK_PAGE_SIZE = 48
+MAX_LINK_PAGE_SIZE = 200
+CONVERSATION_PAGE_SIZE = 50
+MAX_CONVERSATION_PAGE_SIZE = 200
 
 @strawberry.type
 class Query:
     link: Link = strawberry_django.field()
     links: List[Link] = strawberry.django.field()
+
+    @strawberry_django.field
+    def linksPage(self, info: Info, filters: Optional[LinkFilter] = None,
+                  first: int = LINK_PAGE_SIZE, after: Optional[str] = None) -> LinkConnection:
+        """Newest links first, paged by a (created_at, id) keyset cursor"""
+        first = max(0, min(first, MAX_LINK_PAGE_SIZE))
+        queryset = strawberry_django.filters.apply(filters, models.Link.objects.all(), info)
+
+        page = queryset.order_by('-created_at', '-id')
+        if after:
+            created_at, link_id = decode_link_cursor(after)
+            page = page.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=link_id))
+
+        # Fetch one extra row to learn whether another page follows
+        results = list(page[:first + 1])
+        has_next_page = len(results) > first
+        results = results[:first]
+
+        end_cursor = encode_link_cursor(results[-1]) if results else after
+        return LinkConnection(
+            results=results,
+            page_info=PageInfo(has_next_page=has_next_page, end_cursor=end_cursor),
+            queryset=queryset,
+        )
     
     person: Person = strawberry_django.field()
     people: List[Person] = strawberry.django.field()
@@ -24,28 +82,105 @@ class Query:
     promptTemplates: List[PromptTemplate] = strawberry_django.field()
 
     assistantConversation: AssistantConversation = strawberry_django.field()
-    assistantConversations: List[AssistantConversation] = strawberry_django.field()
+
+    @strawberry_django.field
+    def assistantConversations(self) -> List[AssistantConversation]:
+        return models.AssistantConversation.objects.with_summary()
+
+    @strawberry_django.field
+    def assistantConversationsPage(self, first: int = CONVERSATION_PAGE_SIZE,
+                                   after: Optional[str] = None) -> AssistantConversationConnection:
+        """Newest conversations first, with previews annotated in the same query"""
+        first = max(0, min(first, MAX_CONVERSATION_PAGE_SIZE))
+        queryset = models.AssistantConversation.objects.all()
+
+        page = queryset.with_summary().order_by('-created_at', '-id')
+        if after:
+            created_at, conversation_id = decode_conversation_cursor(after)
+            page = page.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=conversation_id))
+
+        # Fetch one extra row to learn whether another page follows
+        results = list(page[:first + 1])
+        has_next_page = len(results) > first
+        results = results[:first]
+
+        end_cursor = encode_conversation_cursor(results[-1]) if results else after
+        return AssistantConversationConnection(
+            results=results,
+            page_info=PageInfo(has_next_page=has_next_page, end_cursor=end_cursor),
+            queryset=queryset,
+        )
     
     system_logs: List[SystemLog] = strawberry_django.field()
 
     @strawberry_django.field
     def tags(self) -> List[str]:
-        return models.Link.objects.unique_tags()
+        return search_cache.get_or_set(('tags',), lambda: list(models.Link.objects.unique_tags()))
+
+    tagCounts: List[Tag] = strawberry_django.field()
+    
+    @strawberry_django.field
+    def search(self, query: str, order: Optional[SearchOrder] = None, type: Optional[str] = None,
+               first: int = SEARCH_PAGE_SIZE, after: Optional[str] = None, mode: Optional[str] = None) -> SearchConnection:
+        first = max(0, min(first, MAX_SEARCH_PAGE_SIZE))
+        offset = decode_search_cursor(after) + 1 if after else 0
+
+        # Fetch one extra row to learn whether another page follows
+        results = models.SearchIndex.objects.search(query, type, order, limit=first + 1, offset=offset, mode=mode)
+        has_next_page = len(results) > first
+        results = results[:first]
+
+        end_cursor = encode_search_cursor(offset + len(results) - 1) if results else after
+        return SearchConnection(
+            results=results,
+            page_info=PageInfo(has_next_page=has_next_page, end_cursor=end_cursor),
+            query=query,
+            item_type=type,
+            mode=mode,
+        )
+    
+    @strawberry_django.field
+    def typeahead(self, query: str, type: Optional[str] = None, first: int = 10) -> List[TypeaheadResult]:
+        first = max(0, min(first, MAX_TYPEAHEAD_RESULTS))
+        return [
+            TypeaheadResult(id=row['item_id'], type=row['item_type'], title=row['title'])
+            for row in models.SearchIndex.objects.typeahead(query, type, first)
+        ]
     
+    @strawberry.field
+    def searchCacheStats(self) -> SearchCacheStats:
+        return SearchCacheStats(
+            hits=search_cache.hits,
+            misses=search_cache.misses,
+            size=len(search_cache),
+            max_size=search_cache.max_size,
+            generation=search_cache.generation,
+        )
+    
+    @strawberry_django.field
+    def copyEditCacheStats(self) -> CopyEditCacheStats:
+        stats = copy_edit_cache.stats
+        return CopyEditCacheStats(
+            hits=stats.hits,
+            misses=stats.misses,
+            hit_rate=stats.hit_rate,
+            size=models.CopyEditCacheEntry.objects.count(),
+        )
+
     @strawberry_django.field
-    def search(self, query: str, order: Optional[SearchOrder] = None, type: Optional[str] = None) -> List[Union[Link,Person]]:
-        return models.SearchIndex.objects.search(query, type, order)
+    def assistantUsage(self, since: Optional[datetime.datetime] = None) -> List[AssistantUsageStats]:
+        return [AssistantUsageStats(**totals) for totals in models.AssistantUsage.objects.totals(since)]
     
     @strawberry.type
     class Count:
 
         @strawberry_django.field
         def link(self) -> int:
-            return models.Link.objects.count()
+            return search_cache.get_or_set(('count', 'link'), models.Link.objects.count)
         
         @strawberry_django.field
         def people(self) -> int:
-            return models.Person.objects.count()
+            return search_cache.get_or_set(('count', 'person'), models.Person.objects.count)
     
     @strawberry.field
     def count(self) -> Count:
@@ -65,6 +200,8 @@ class Query:
     
     calendarEmailLogs: List[CalendarEmailLog] = strawberry_django.field()
 
+    job: Job = strawberry_django.field()
+
 @strawberry.type
 class Mutation:
     createLink: Link = mutations.create(LinkInput)
@@ -91,16 +228,16 @@ class Mutation:
         return project
 
     @strawberry_django.mutation
-    def startConversation(self, system: str, request: str, promptID: Optional[uuid.UUID] = None) -> AssistantConversation:
+    async def startConversation(self, system: str, request: str, promptID: Optional[uuid.UUID] = None) -> AssistantConversation:
         if promptID:
-            prompt = models.PromptTemplate.objects.get(pk=promptID)
+            prompt = await models.PromptTemplate.objects.aget(pk=promptID)
             system = prompt.system_message
-        return assistant.start_conversation(system, request)
+        return await assistant.start_conversation(system, request)
     
     @strawberry_django.mutation
-    def sendMessage(self, conversationID: uuid.UUID, request: str) -> AssistantMessage:
-        conversation = models.AssistantConversation.objects.get(pk=conversationID)
-        return assistant.send_message(conversation, request)
+    async def sendMessage(self, conversationID: uuid.UUID, request: str) -> AssistantMessage:
+        conversation = await models.AssistantConversation.objects.aget(pk=conversationID)
+        return await assistant.send_message(conversation, request)
 
     @strawberry_django.mutation
     def updateScratchPad(self, body: str) -> ScratchPad:
@@ -111,21 +248,18 @@ class Mutation:
 
     @strawberry_django.mutation
     def clickLink(self, linkId: uuid.UUID) -> Link:
-        link = models.Link.objects.get(pk=linkId)
-        link.click_count += 1
-        link.save()
-        return link
+        return models.Link.objects.record_click(linkId)
 
     @strawberry_django.mutation
-    def copyEdit(self, text: str, editorType: Optional[str] = "spotify") -> str:
-        return assistant.copy_edit(text, editorType)
+    async def copyEdit(self, text: str, editorType: Optional[str] = "spotify", chunked: Optional[bool] = None) -> str:
+        return await assistant.copy_edit(text, editorType, chunked)
     
     # Calendar and notification mutations
     updateNotificationSettings: List[NotificationSettings] = mutations.update(NotificationSettingsInput)
     updateCalendarSettings: List[CalendarSettings] = mutations.update(CalendarSettingsInput)
     
     @strawberry_django.mutation
-    def validateGoogleCredentials(self, input: GoogleOAuthInput) -> GoogleCredentials:
+    async def validateGoogleCredentials(self, input: GoogleOAuthInput) -> GoogleCredentials:
         """Validate Google user credentials and store them"""
         from .calendar_service import CalendarService
         import json
@@ -133,7 +267,8 @@ class Mutation:
         calendar_service = CalendarService()
         credentials_json = json.loads(input.credentials_json)
         
-        google_creds = calendar_service.validate_and_store_credentials(
+        google_creds = await run_blocking(
+            calendar_service.validate_and_store_credentials,
             input.account_id,
             input.account_name,
             credentials_json
@@ -159,12 +294,40 @@ class Mutation:
         return calendar_setting
     
     @strawberry_django.mutation
-    def sendTestCalendarEmail(self) -> bool:
+    async def sendTestCalendarEmail(self) -> bool:
         """Send a test calendar email"""
         from .calendar_service import CalendarService
         
         calendar_service = CalendarService()
-        return calendar_service.send_daily_email(force_send=True)
+        return await run_blocking(calendar_service.send_daily_email, force_send=True)
+
+    # Background versions of the slow mutations above. They return a queued
+    # job at once, poll Query.job for its status and result.
+    @strawberry_django.mutation
+    def startConversationJob(self, system: str, request: str, promptID: Optional[uuid.UUID] = None) -> Job:
+        if promptID:
+            system = models.PromptTemplate.objects.get(pk=promptID).system_message
+        return jobs.enqueue('start_conversation', system=system, request=request)
+
+    @strawberry_django.mutation
+    def sendMessageJob(self, conversationID: uuid.UUID, request: str) -> Job:
+        return jobs.enqueue('send_message', conversation_id=str(conversationID), request=request)
+
+    @strawberry_django.mutation
+    def copyEditJob(self, text: str, editorType: Optional[str] = "spotify", chunked: Optional[bool] = None) -> Job:
+        return jobs.enqueue('copy_edit', text=text, editor_type=editorType, chunked=chunked)
+
+    @strawberry_django.mutation
+    def sendTestCalendarEmailJob(self) -> Job:
+        return jobs.enqueue('send_test_calendar_email')
 
 
-schema = strawberry.Schema(query=Query, mutation=Mutation)
\ No newline at end of file
+schema = strawberry.Schema(
+    query=Query,
+    mutation=Mutation,
+    extensions=[
+        # Resolves relations like Person.logs and PersonLog.person with
+        # select_related/prefetch_related instead of a query per row
+        DjangoOptimizerExtension,
+    ],
+)
\ No newline at end of file
@@ -0,0 +1,78 @@
+"""
+In-process cache for search results and other read-mostly queries.
+
+Entries are keyed on the query arguments and stamped with a generation
+number. Saving or deleting a Link, Person or Project bumps the generation,
+which drops every entry at once, so the cache never serves results older
+than the last write this process saw. The TTL bounds staleness from writes
+made by other worker processes.
+"""
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any
+
+from django.conf import settings
+
+
+@dataclass
+class _Entry:
+    value: Any
+    generation: int
+    created: float
+
+
+class SearchCache:
+    """Bounded LRU cache with a TTL and generation based invalidation"""
+
+    def __init__(self, max_size=256, ttl=5.0, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_set(self, key, compute):
+        """Return the cached value for key, computing and storing it on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry.generation == self._generation and self._clock() - entry.created < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.value
+            self.misses += 1
+            generation = self._generation
+
+        value = compute()
+
+        with self._lock:
+            # A write landed while computing, the value may already be stale
+            if self.max_size > 0 and generation == self._generation:
+                self._entries[key] = _Entry(value, generation, self._clock())
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self):
+        """Start a new generation, dropping every cached entry"""
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def __len__(self):
+        return len(self._entries)
+
+
+search_cache = SearchCache(
+    max_size=getattr(settings, 'SEARCH_CACHE_SIZE', 256),
+    ttl=getattr(settings, 'SEARCH_CACHE_TTL', 5.0),
+)
@@ -0,0 +1,78 @@
+"""
+Maintenance helpers for the incremental search index.
+
+The success_search_index table is kept up to date row by row by database
+triggers on success_link, success_person and success_project (migration
+0023). The success_search_index_source view holds the canonical definition
+of an index row, so the table can always be rebuilt or checked against it.
+"""
+import logging
+from dataclasses import dataclass
+
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = "item_type, item_id, body, body_vector, click_count, created_at, title, popularity, popularity_updated_at"
+
+
+@dataclass
+class SearchIndexDrift:
+    """Rows where the index table disagrees with the source view"""
+    missing: int
+    stale: int
+    orphaned: int
+
+    @property
+    def clean(self) -> bool:
+        return not (self.missing or self.stale or self.orphaned)
+
+
+def verify_search_index() -> SearchIndexDrift:
+    """Compare the index table against the source view"""
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            SELECT
+                COUNT(*) FILTER (WHERE i.item_id IS NULL),
+                COUNT(*) FILTER (WHERE i.item_id IS NOT NULL AND (
+                    i.item_type, i.body, i.body_vector, i.click_count, i.created_at, i.title,
+                    i.popularity, i.popularity_updated_at
+                ) IS DISTINCT FROM (
+                    s.item_type, s.body, s.body_vector, s.click_count, s.created_at, s.title,
+                    s.popularity, s.popularity_updated_at
+                ))
+            FROM success_search_index_source s
+            LEFT JOIN success_search_index i ON i.item_id = s.item_id
+        """)
+        missing, stale = cursor.fetchone()
+        cursor.execute("""
+            SELECT COUNT(*) FROM success_search_index i
+            WHERE NOT EXISTS (SELECT 1 FROM success_search_index_source s WHERE s.item_id = i.item_id)
+        """)
+        orphaned, = cursor.fetchone()
+    return SearchIndexDrift(missing=missing, stale=stale, orphaned=orphaned)
+
+
+def backfill_search_index() -> int:
+    """Upsert every source row into the index table and drop orphans"""
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"""
+            INSERT INTO success_search_index ({COLUMNS})
+            SELECT {COLUMNS} FROM success_search_index_source
+            ON CONFLICT (item_id) DO UPDATE SET
+                item_type = EXCLUDED.item_type,
+                body = EXCLUDED.body,
+                body_vector = EXCLUDED.body_vector,
+                click_count = EXCLUDED.click_count,
+                created_at = EXCLUDED.created_at,
+                title = EXCLUDED.title,
+                popularity = EXCLUDED.popularity,
+                popularity_updated_at = EXCLUDED.popularity_updated_at
+        """)
+        upserted = cursor.rowcount
+        cursor.execute("""
+            DELETE FROM success_search_index i
+            WHERE NOT EXISTS (SELECT 1 FROM success_search_index_source s WHERE s.item_id = i.item_id)
+        """)
+    logger.info("Backfilled %s search index rows.", upserted)
+    return upserted
@@ -38,6 +38,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'strawberry.django',
     'ordered_model',
     'solo',
@@ -166,8 +167,49 @@ LOGGING = {
     }
 }
 
+# Search
+# In-process cache for search, tag and count queries. Writes in this process
+# invalidate it immediately, but other processes (gunicorn workers, the job
+# worker) keep serving their copy until the TTL runs out. The TTL is how stale
+# a result can be after a write elsewhere: a few seconds still absorbs bursts
+# of repeated typeahead queries, raise it only if that staleness is acceptable.
+SEARCH_CACHE_SIZE = int(os.environ.get('SEARCH_CACHE_SIZE', 256))
+SEARCH_CACHE_TTL = float(os.environ.get('SEARCH_CACHE_TTL', 5))
+# Days for a link click to lose half its weight in search ranking. Run
+# manage.py recompute_link_popularity after changing it.
+LINK_POPULARITY_HALF_LIFE_DAYS = float(os.environ.get('LINK_POPULARITY_HALF_LIFE_DAYS', 30))
+
+# Assistant
+# Estimated tokens of conversation history sent with each message. Older
+# turns beyond it are folded into a rolling summary on the conversation.
+ASSISTANT_CONTEXT_TOKENS = int(os.environ.get('ASSISTANT_CONTEXT_TOKENS', 12000))
+# Copy edit results are reused for identical requests for this many days,
+# keeping at most COPY_EDIT_CACHE_SIZE of the most recently used.
+COPY_EDIT_CACHE_TTL_DAYS = float(os.environ.get('COPY_EDIT_CACHE_TTL_DAYS', 30))
+COPY_EDIT_CACHE_SIZE = int(os.environ.get('COPY_EDIT_CACHE_SIZE', 10000))
+# Text longer than this is split at paragraphs and the pieces edited in
+# parallel, at most COPY_EDIT_CONCURRENCY at a time.
+COPY_EDIT_CHUNK_CHARS = int(os.environ.get('COPY_EDIT_CHUNK_CHARS', 4000))
+COPY_EDIT_CONCURRENCY = int(os.environ.get('COPY_EDIT_CONCURRENCY', 4))
+
+# Background jobs
+# Seconds a job may run before it is assumed lost with its worker and queued
+# again, and seconds an idle worker waits before polling for new jobs.
+JOB_TIMEOUT = int(os.environ.get('JOB_TIMEOUT', 600))
+JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', 1))
+
 # Calendar Encription Key
 CALENDAR_ENCRYPTION_KEY = os.environ.get('CALENDAR_ENCRYPTION_KEY')
+# Accounts and calendars fetched at once when building the daily summary
+CALENDAR_FETCH_WORKERS = int(os.environ.get('CALENDAR_FETCH_WORKERS', 8))
+# How far back the local event store reaches, a full sync starts here
+CALENDAR_SYNC_PAST_DAYS = int(os.environ.get('CALENDAR_SYNC_PAST_DAYS', 7))
+# How far ahead it reaches, recurring events are only expanded this far
+CALENDAR_SYNC_FUTURE_DAYS = int(os.environ.get('CALENDAR_SYNC_FUTURE_DAYS', 90))
+# Seconds decrypted credentials are kept in memory
+CALENDAR_CREDENTIAL_CACHE_TTL = float(os.environ.get('CALENDAR_CREDENTIAL_CACHE_TTL', 3600))
+# refresh_calendar_tokens renews tokens expiring within this many minutes
+CALENDAR_TOKEN_REFRESH_MINUTES = int(os.environ.get('CALENDAR_TOKEN_REFRESH_MINUTES', 20))
 
 # Email Configuration
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
@@ -1,6 +1,49 @@
-from django.test import TestCase
-from success.models import SearchIndex
-from success import assistant
+import asyncio
+import itertools
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from unittest import skipUnless
+from unittest.mock import AsyncMock, Mock, patch
+from zoneinfo import ZoneInfo
+
+import httplib2
+from asgiref.sync import async_to_sync
+from cryptography.fernet import Fernet
+from django.conf import settings
+from django.db import OperationalError, close_old_connections, connection
+from django.db.migrations.recorder import MigrationRecorder
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings, tag
+from django.utils import timezone
+from google.oauth2.credentials import Credentials
+from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+from googleapiclient.http import HttpMockSequence
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from success.models import (
+    AssistantConversation, AssistantMessage, AssistantUsage, CalendarEvent, CalendarSettings, CopyEditCacheEntry, GoogleCredentials, Job, Link, LinkClick,
+    Person, PersonLog, Project, SearchIndex, Tag, SEARCH_MODE_TRIGRAM,
+)
+from success.assistant import pack_paragraphs, split_paragraphs
+from success.assistant_context import MESSAGE_OVERHEAD_TOKENS, build_context, estimate_tokens, split_history
+from success.search_index import backfill_search_index, verify_search_index
+from success import assistant, copy_edit_cache, jobs
+from success.calendar_service import CalendarService, CredentialCache, client_cache, credential_cache
+from success.schema import schema
+from success.search_cache import SearchCache, search_cache
+from success.types import encode_search_cursor
+
+# Wall clock benchmarks are tagged "benchmark" and skipped unless asked for:
+# RUN_BENCHMARKS=1 python manage.py test --tag benchmark
+
+# Per-keystroke latency budget for typeahead, in seconds
+TYPEAHEAD_BUDGET = 0.05
 
 class SuccessTestCase(TestCase):
 
@@ -41,6 +84,1468 @@ class SuccessTestCase(TestCase):
         results = SearchIndex.objects.search("mike", "person")
         self.assertEqual(len(list(results)),1)
 
+    def test_search_trigram(self):
+        # Partial search through word similarity instead of a substring scan
+        results = SearchIndex.objects.search("mik", mode=SEARCH_MODE_TRIGRAM)
+        self.assertTrue(len(results) > 1)
+
+        results = SearchIndex.objects.search("mike", "person", mode=SEARCH_MODE_TRIGRAM)
+        self.assertEqual(len(results), 1)
+
+        results = SearchIndex.objects.search("fubar", mode=SEARCH_MODE_TRIGRAM)
+        self.assertEqual(len(results), 0)
+
+    def test_search_substring_is_plain_ilike(self):
+        sql = str(SearchIndex.objects.matching("Mik").query)
+        self.assertIn('"success_search_index"."body" ILIKE', sql)
+        self.assertNotIn("UPPER", sql)
+        # Case insensitive, and LIKE wildcards in the query are matched literally
+        self.assertTrue(SearchIndex.objects.matching("MIK").exists())
+        self.assertFalse(SearchIndex.objects.matching("m%k").exists())
+
+    def test_search_substring_uses_trigram_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_indexes WHERE indexname = 'success_search_body_trgm_index'")
+            if cursor.fetchone() is None:
+                self.skipTest("pg_trgm is not available")
+            sql, params = SearchIndex.objects.matching("mik").values("item_id").query.sql_with_params()
+            # The table is tiny, so take sequential scans off the table to see whether the index can serve the match
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            cursor.execute(f"EXPLAIN {sql}", params)
+            plan = "\n".join(row[0] for row in cursor.fetchall())
+        self.assertIn("success_search_body_trgm_index", plan)
+
+    def test_search_pagination(self):
+        page_query = """
+            query Search($after: String) {
+                search(query: "search", type: "link", first: 1, after: $after) {
+                    totalCount
+                    pageInfo { hasNextPage endCursor }
+                    results { ... on Link { id } }
+                }
+            }
+        """
+        first_page = schema.execute_sync(page_query).data["search"]
+        self.assertEqual(first_page["totalCount"], 2)
+        self.assertEqual(len(first_page["results"]), 1)
+        self.assertTrue(first_page["pageInfo"]["hasNextPage"])
+
+        second_page = schema.execute_sync(page_query, variable_values={"after": first_page["pageInfo"]["endCursor"]}).data["search"]
+        self.assertEqual(len(second_page["results"]), 1)
+        self.assertFalse(second_page["pageInfo"]["hasNextPage"])
+        self.assertNotEqual(first_page["results"][0]["id"], second_page["results"][0]["id"])
+
+    def test_search_rejects_negative_cursor(self):
+        result = schema.execute_sync(
+            'query Search($after: String) { search(query: "search", after: $after) { totalCount } }',
+            variable_values={"after": encode_search_cursor(-5)},
+        )
+        self.assertIn("Invalid search cursor", result.errors[0].message)
+
     def test_assistant(self):
         answer = assistant.predict("You are a person", "respond with multiple lines")
-        self.assertTrue("\n" in answer.response)
\ No newline at end of file
+        self.assertTrue("\n" in answer.response)
+
+
+class RecordingChatModel(GenericFakeChatModel):
+    """Fake chat model that streams canned replies word by word and keeps the prompts it was sent"""
+    prompts: list = []
+
+    def _generate(self, messages, *args, **kwargs):
+        # Streaming goes through here too
+        self.prompts.append(messages)
+        return super()._generate(messages, *args, **kwargs)
+
+
+class AssistantStreamTestCase(TestCase):
+
+    def fake_llm(self, reply):
+        return RecordingChatModel(messages=iter([AIMessage(content=reply)]))
+
+    async def stream(self, body):
+        response = await self.async_client.post("/assistant/stream", body, content_type="application/json")
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        events = []
+        async for chunk in response.streaming_content:
+            name, data = chunk.decode().strip().split("\n")
+            events.append((name.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+        return events
+
+    async def test_streams_new_conversation(self):
+        with patch.object(assistant, "llm", self.fake_llm("Hello there, friend")):
+            events = await self.stream({"system": "You are a person", "request": "Say hello"})
+
+        names = [name for name, _ in events]
+        self.assertEqual(names[0], "conversation")
+        self.assertEqual(names[-1], "done")
+        self.assertGreater(names.count("token"), 1)
+        self.assertEqual("".join(data["text"] for name, data in events if name == "token"), "Hello there, friend")
+
+        conversation = await AssistantConversation.objects.aget(pk=events[0][1]["id"])
+        messages = [message async for message in conversation.assistant_messages.order_by("created_at")]
+        self.assertEqual([(m.role, m.content) for m in messages], [("user", "Say hello"), ("assistant", "Hello there, friend")])
+        self.assertEqual(str(messages[-1].id), events[-1][1]["id"])
+
+    async def test_continues_conversation_with_history(self):
+        conversation = await AssistantConversation.objects.acreate(system_message="You are a person")
+        await AssistantMessage.objects.acreate(conversation=conversation, role="user", content="Hi")
+        await AssistantMessage.objects.acreate(conversation=conversation, role="assistant", content="Hello")
+
+        llm = self.fake_llm("Still here")
+        with patch.object(assistant, "llm", llm):
+            events = await self.stream({"conversationID": str(conversation.id), "request": "Are you there?"})
+
+        self.assertEqual([assistant._message_text(message) for message in llm.prompts[0]], ["You are a person", "Hi", "Hello", "Are you there?"])
+        self.assertEqual(events[-1][0], "done")
+        self.assertEqual(await conversation.assistant_messages.acount(), 4)
+
+    async def test_rejects_bad_requests(self):
+        response = await self.async_client.post("/assistant/stream", {"system": "x"}, content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        response = await self.async_client.post(
+            "/assistant/stream", {"conversationID": str(uuid.uuid4()), "request": "x"}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 404)
+        response = await self.async_client.post(
+            "/assistant/stream", {"conversationID": "not-a-uuid", "request": "x"}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 400)
+
+    async def test_failed_reply_ends_with_error_event(self):
+        async def fail_part_way(conversation, request):
+            yield "Hel"
+            raise RuntimeError("Upstream timed out")
+
+        with patch.object(assistant, "stream_message", fail_part_way), self.assertLogs("success.views", "ERROR"):
+            events = await self.stream({"system": "You are a person", "request": "Say hello"})
+
+        self.assertEqual([name for name, _ in events], ["conversation", "token", "error"])
+
+
+class AssistantContextTestCase(TestCase):
+
+    async def make_conversation(self, turns, length=200):
+        conversation = await AssistantConversation.objects.acreate(system_message="You are a person")
+        for turn in range(turns):
+            await AssistantMessage.objects.acreate(conversation=conversation, role="user", content=f"Q{turn} " + "q" * length)
+            await AssistantMessage.objects.acreate(conversation=conversation, role="assistant", content=f"A{turn} " + "a" * length)
+        return conversation
+
+    def test_estimate_tokens(self):
+        self.assertEqual(estimate_tokens(""), MESSAGE_OVERHEAD_TOKENS)
+        self.assertEqual(estimate_tokens("x" * 400), 100 + MESSAGE_OVERHEAD_TOKENS)
+
+    def test_split_history_keeps_newest_from_a_user_turn(self):
+        history = [AssistantMessage(role=role, content="x" * 40) for role in ["user", "assistant"] * 5]
+        folded, kept = split_history(history, budget=3 * estimate_tokens("x" * 40))
+        self.assertEqual(len(folded) + len(kept), 10)
+        self.assertEqual(len(kept), 2)
+        self.assertEqual(kept[0].role, "user")
+
+    async def test_short_history_is_sent_verbatim(self):
+        conversation = await self.make_conversation(turns=3)
+        summarize = AsyncMock()
+        context = await build_context(conversation, summarize, pending="Next")
+        summarize.assert_not_called()
+        self.assertEqual(len(context.recent), 6)
+        self.assertEqual(context.summary, "")
+
+    @override_settings(ASSISTANT_CONTEXT_TOKENS=1000)
+    async def test_long_history_is_summarized_and_bounded(self):
+        conversation = await self.make_conversation(turns=20)
+        summarize = AsyncMock(return_value="They talked about q and a")
+
+        context = await build_context(conversation, summarize, pending="Next")
+        summarize.assert_awaited_once()
+        folded = summarize.await_args.args[1]
+        self.assertEqual(folded[0].content, "Q0 " + "q" * 200)
+        self.assertLessEqual(context.estimated_tokens, 1000)
+        self.assertEqual(context.recent[0].role, "user")
+        self.assertIn("They talked about q and a", context.to_messages()[0].content)
+
+        await conversation.arefresh_from_db()
+        self.assertEqual(conversation.summary, "They talked about q and a")
+        self.assertEqual(conversation.summarized_message_count, len(folded))
+        self.assertEqual(conversation.summarized_message_count + len(context.recent), 40)
+
+        # Folding goes to half the budget, so the next turn needs no new summary
+        await AssistantMessage.objects.acreate(conversation=conversation, role="user", content="Next")
+        await AssistantMessage.objects.acreate(conversation=conversation, role="assistant", content="Sure")
+        await build_context(conversation, summarize, pending="And then")
+        summarize.assert_awaited_once()
+
+    @override_settings(ASSISTANT_CONTEXT_TOKENS=1000)
+    async def test_send_message_prompt_stays_bounded(self):
+        conversation = await self.make_conversation(turns=5)
+        llm = RecordingChatModel(messages=itertools.repeat(AIMessage(content="x" * 200)))
+        with patch.object(assistant, "llm", llm):
+            for turn in range(30):
+                await assistant.send_message(conversation, f"Turn {turn} " + "t" * 200)
+
+        replies = [prompt for prompt in llm.prompts if assistant._message_text(prompt[0]).startswith("You are a person")]
+        self.assertEqual(len(replies), 30)
+        largest = max(sum(estimate_tokens(assistant._message_text(message)) for message in prompt) for prompt in replies)
+        self.assertLessEqual(largest, 1000 + estimate_tokens("x" * 200))
+        await conversation.arefresh_from_db()
+        self.assertGreater(conversation.summarized_message_count, 0)
+
+
+class AssistantPromptCacheTestCase(TestCase):
+
+    def fake_llm(self, cache_read=0, cache_creation=0):
+        usage = {
+            "input_tokens": 2000, "output_tokens": 20, "total_tokens": 2020,
+            "input_token_details": {"cache_read": cache_read, "cache_creation": cache_creation},
+        }
+        return RecordingChatModel(messages=itertools.repeat(AIMessage(content="Edited", usage_metadata=usage)))
+
+    def breakpoints(self, prompt):
+        return [
+            index for index, message in enumerate(prompt)
+            if isinstance(message.content, list) and "cache_control" in message.content[-1]
+        ]
+
+    async def test_copy_edit_caches_system_prompt(self):
+        llm = self.fake_llm(cache_read=1800)
+        with patch.object(assistant, "copy_editor_llm", llm):
+            self.assertEqual(await assistant.copy_edit("Draft", "simple"), "Edited")
+
+        prompt = llm.prompts[0]
+        self.assertEqual(self.breakpoints(prompt), [0])
+        self.assertEqual(prompt[-1].content, "Draft")
+
+        usage = await AssistantUsage.objects.aget()
+        self.assertEqual((usage.kind, usage.input_tokens, usage.cache_read_tokens), ("copy_edit", 2000, 1800))
+
+    async def test_send_message_caches_history_prefix(self):
+        conversation = await AssistantConversation.objects.acreate(system_message="You are a person")
+        await AssistantMessage.objects.acreate(conversation=conversation, role="user", content="Hi")
+        await AssistantMessage.objects.acreate(conversation=conversation, role="assistant", content="Hello")
+
+        llm = self.fake_llm(cache_creation=1500)
+        with patch.object(assistant, "llm", llm):
+            await assistant.send_message(conversation, "Again")
+
+        # System message and the last replayed message, never the new request
+        self.assertEqual(self.breakpoints(llm.prompts[0]), [0, 2])
+        usage = await AssistantUsage.objects.aget()
+        self.assertEqual((usage.kind, usage.conversation_id, usage.cache_creation_tokens), ("conversation", conversation.id, 1500))
+
+    async def test_usage_totals(self):
+        with patch.object(assistant, "copy_editor_llm", self.fake_llm(cache_read=1500)):
+            await assistant.copy_edit("One", "simple")
+            await assistant.copy_edit("Two", "simple")
+
+        result = await schema.execute("query { assistantUsage { kind calls inputTokens cacheReadTokens cacheHitRate } }")
+        self.assertIsNone(result.errors)
+        self.assertEqual(result.data["assistantUsage"], [
+            {"kind": "copy_edit", "calls": 2, "inputTokens": 4000, "cacheReadTokens": 3000, "cacheHitRate": 0.75},
+        ])
+
+
+class CopyEditCacheTestCase(TestCase):
+
+    def setUp(self):
+        self.llm = RecordingChatModel(messages=(AIMessage(content=f"Edited {n}") for n in itertools.count()))
+        patcher = patch.object(assistant, "copy_editor_llm", self.llm)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        copy_edit_cache.stats.hits = copy_edit_cache.stats.misses = 0
+
+    async def test_identical_requests_hit(self):
+        self.assertEqual(await assistant.copy_edit("Draft", "simple"), "Edited 0")
+
+        # Answered from the cache without calling the model
+        self.assertEqual(await assistant.copy_edit("Draft", "simple"), "Edited 0")
+        self.assertEqual(len(self.llm.prompts), 1)
+
+        # Any change to the key is a different request
+        self.assertEqual(await assistant.copy_edit("Draft", "spotify"), "Edited 1")
+        self.assertEqual(await assistant.copy_edit("Draft.", "simple"), "Edited 2")
+        self.assertEqual(len(self.llm.prompts), 3)
+
+        result = await schema.execute("query { copyEditCacheStats { hits misses hitRate size } }")
+        self.assertEqual(result.data["copyEditCacheStats"], {"hits": 1, "misses": 3, "hitRate": 0.25, "size": 3})
+        self.assertEqual((await CopyEditCacheEntry.objects.aget(result="Edited 0")).hits, 1)
+
+    async def test_prompt_change_misses(self):
+        await assistant.copy_edit("Draft", "simple")
+        with patch.dict(assistant.COPY_EDIT_PROMPTS, {"simple": "Fix the typos."}):
+            self.assertEqual(await assistant.copy_edit("Draft", "simple"), "Edited 1")
+
+    @override_settings(COPY_EDIT_CACHE_TTL_DAYS=1)
+    async def test_expired_entries_miss(self):
+        await assistant.copy_edit("Draft", "simple")
+        await CopyEditCacheEntry.objects.aupdate(created_at=timezone.now() - timedelta(days=2))
+        self.assertEqual(await assistant.copy_edit("Draft", "simple"), "Edited 1")
+        self.assertEqual(await CopyEditCacheEntry.objects.acount(), 1)
+
+    @override_settings(COPY_EDIT_CACHE_SIZE=2)
+    async def test_least_recently_used_are_evicted(self):
+        await assistant.copy_edit("One", "simple")
+        await assistant.copy_edit("Two", "simple")
+        await assistant.copy_edit("One", "simple")
+        await assistant.copy_edit("Three", "simple")
+
+        self.assertEqual(
+            {entry async for entry in CopyEditCacheEntry.objects.values_list("result", flat=True)},
+            {"Edited 0", "Edited 2"},
+        )
+
+
+class CopyEditCacheConcurrencyTestCase(TransactionTestCase):
+
+    def test_concurrent_puts_on_one_key(self):
+        barrier = threading.Barrier(8)
+
+        def put(number):
+            try:
+                barrier.wait(timeout=5)
+                async_to_sync(copy_edit_cache.put)("key", "simple", "model", f"Edited {number}")
+            finally:
+                close_old_connections()
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(put, range(8)))
+
+        self.assertEqual(CopyEditCacheEntry.objects.count(), 1)
+
+
+class SlowChatModel(GenericFakeChatModel):
+    """Fake chat model that takes a while to answer, like a real LLM call
+
+    peak records the most calls that were ever in flight at once.
+    """
+    delay: float = 0.2
+    running: int = 0
+    peak: int = 0
+
+    async def _agenerate(self, messages, *args, **kwargs):
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.running -= 1
+        return await super()._agenerate(messages, *args, **kwargs)
+
+
+class EchoChatModel(SlowChatModel):
+    """Slow fake model that returns the last message upper-cased"""
+    prompts: list = []
+
+    def _generate(self, messages, *args, **kwargs):
+        self.prompts.append(messages)
+        reply = AIMessage(content=assistant._message_text(messages[-1]).upper())
+        return ChatResult(generations=[ChatGeneration(message=reply)])
+
+
+@override_settings(COPY_EDIT_CHUNK_CHARS=100, COPY_EDIT_CONCURRENCY=4)
+class ChunkedCopyEditTestCase(TestCase):
+
+    paragraphs = [f"Paragraph {number}. " + "word " * 15 for number in range(8)]
+
+    def test_split_rebuilds_text(self):
+        text = "\n\n".join(self.paragraphs[:3]) + "\n \n\n" + "x" * 250 + "\n\n" + self.paragraphs[3]
+        paragraphs, separators = split_paragraphs(text)
+        self.assertEqual(len(separators), len(paragraphs) - 1)
+        self.assertEqual("".join(itertools.chain.from_iterable(itertools.zip_longest(paragraphs, separators, fillvalue=""))), text)
+        self.assertEqual(paragraphs[3], "x" * 250)
+
+    def test_pack_keeps_neighbours_within_limit(self):
+        paragraphs, separators = ["a" * 40, "b" * 40, "c" * 40, "x" * 250, "d" * 40, "e" * 40], ["\n\n"] * 5
+        chunks = pack_paragraphs(paragraphs, separators, [0, 1, 2, 3, 5], 100)
+        self.assertEqual(chunks, [[0, 1], [2], [3], [5]])
+
+    async def test_chunks_edited_in_parallel_and_in_order(self):
+        llm = EchoChatModel(messages=iter([]), delay=0.1)
+        text = "\n\n".join(self.paragraphs)
+        with patch.object(assistant, "copy_editor_llm", llm):
+            edited = await assistant.copy_edit(text, "simple")
+
+        self.assertEqual(edited, text.upper())
+        self.assertEqual(len(llm.prompts), 8)
+        # Chunks overlap, but never more than COPY_EDIT_CONCURRENCY at once
+        self.assertGreater(llm.peak, 1)
+        self.assertLessEqual(llm.peak, 4)
+
+    async def test_unchanged_chunks_are_reused(self):
+        llm = EchoChatModel(messages=iter([]), delay=0)
+        with patch.object(assistant, "copy_editor_llm", llm):
+            await assistant.copy_edit("\n\n".join(self.paragraphs), "simple")
+            revised = self.paragraphs[:5] + ["A new paragraph."] + self.paragraphs[6:]
+            edited = await assistant.copy_edit("\n\n".join(revised), "simple")
+
+        self.assertEqual(edited, "\n\n".join(revised).upper())
+        self.assertEqual(len(llm.prompts), 9)
+        self.assertEqual(assistant._message_text(llm.prompts[-1][-1]), "A new paragraph.")
+
+    async def test_editing_a_paragraph_keeps_later_chunks_cached(self):
+        llm = EchoChatModel(messages=iter([]), delay=0)
+        with self.settings(COPY_EDIT_CHUNK_CHARS=200), patch.object(assistant, "copy_editor_llm", llm):
+            await assistant.copy_edit("\n\n".join(self.paragraphs), "simple")
+            # Two paragraphs a chunk
+            self.assertEqual(len(llm.prompts), 4)
+
+            # A longer first paragraph would move every later chunk boundary if chunks were keyed whole
+            revised = ["Paragraph 0, now much longer. " + "word " * 20] + self.paragraphs[1:]
+            edited = await assistant.copy_edit("\n\n".join(revised), "simple")
+
+        self.assertEqual(edited, "\n\n".join(revised).upper())
+        self.assertEqual(len(llm.prompts), 5)
+        self.assertEqual(assistant._message_text(llm.prompts[-1][-1]), revised[0])
+
+    async def test_merged_paragraphs_are_kept_whole(self):
+        llm = RecordingChatModel(messages=iter([AIMessage(content="One merged paragraph.")]))
+        with self.settings(COPY_EDIT_CHUNK_CHARS=200), patch.object(assistant, "copy_editor_llm", llm):
+            edited = await assistant.copy_edit("\n\n".join(self.paragraphs[:2]), "simple", chunked=True)
+
+        self.assertEqual(edited, "One merged paragraph.")
+        self.assertEqual(await CopyEditCacheEntry.objects.acount(), 0)
+
+    async def test_short_text_is_one_request(self):
+        llm = EchoChatModel(messages=iter([]), delay=0)
+        with patch.object(assistant, "copy_editor_llm", llm):
+            await assistant.copy_edit("\n\n".join(self.paragraphs), "simple", chunked=False)
+        self.assertEqual(len(llm.prompts), 1)
+
+
+class AsyncGraphQLTestCase(TestCase):
+
+    fixtures = ["seed.yaml"]
+
+    async def execute(self, query, variables=None):
+        response = await self.async_client.post(
+            "/graphql", {"query": query, "variables": variables or {}}, content_type="application/json"
+        )
+        result = json.loads(response.content)
+        self.assertNotIn("errors", result)
+        return result["data"]
+
+    def slow_llm(self, reply, delay=0.2):
+        return SlowChatModel(messages=itertools.repeat(AIMessage(content=reply)), delay=delay)
+
+    async def test_orm_resolvers_run_under_async_view(self):
+        data = await self.execute("""
+            query {
+                linksPage(first: 2) { totalCount results { id tags } }
+                search(query: "success") { totalCount results { ... on Link { id } ... on Person { id } } }
+                people { name logs { note person { name } } }
+                assistantConversations { previewText messages { content } }
+            }
+        """)
+        self.assertGreater(data["search"]["totalCount"], 0)
+
+    async def test_conversation_mutations(self):
+        with patch.object(assistant, "llm", self.slow_llm("Hi there", delay=0)):
+            data = await self.execute("""
+                mutation { startConversation(system: "You are a person", request: "Hello") { id previewText } }
+            """)
+            conversation = data["startConversation"]
+            self.assertEqual(conversation["previewText"], "Hello")
+
+            data = await self.execute("""
+                mutation ($id: UUID!) { sendMessage(conversationID: $id, request: "Again") { role content } }
+            """, {"id": conversation["id"]})
+        self.assertEqual(data["sendMessage"], {"role": "assistant", "content": "Hi there"})
+        self.assertEqual(await AssistantMessage.objects.filter(conversation_id=conversation["id"]).acount(), 4)
+
+    async def test_slow_llm_calls_overlap(self):
+        llm = self.slow_llm("Edited")
+        mutation = 'mutation ($text: String!) { copyEdit(text: $text, editorType: "simple") }'
+        with patch.object(assistant, "copy_editor_llm", llm):
+            results = await asyncio.gather(*(
+                self.execute(mutation, {"text": f"Draft {number}"}) for number in range(10)
+            ))
+
+        self.assertEqual({result["copyEdit"] for result in results}, {"Edited"})
+        # Requests served one at a time would never have two LLM calls in flight
+        self.assertGreater(llm.peak, 1)
+
+    @override_settings(CALENDAR_ENCRYPTION_KEY=Fernet.generate_key())
+    async def test_calendar_email_leaves_the_orm_thread_free(self):
+        started, released = threading.Event(), threading.Event()
+
+        def send_daily_email(calendar_service, force_send=False):
+            started.set()
+            # Only comes back in time if the ORM stays usable while this waits
+            return released.wait(timeout=5)
+
+        with patch.object(CalendarService, "send_daily_email", send_daily_email):
+            mutation = asyncio.ensure_future(self.execute("mutation { sendTestCalendarEmail }"))
+            await asyncio.to_thread(started.wait, 5)
+            await Link.objects.acount()
+            released.set()
+            data = await mutation
+
+        self.assertTrue(data["sendTestCalendarEmail"])
+
+
+class SearchIndexTriggerTestCase(TestCase):
+
+    fixtures = ["seed.yaml"]
+
+    def test_index_follows_writes(self):
+        link = Link.objects.create(title="Trigger", url="https://example.com", tags=["zebra"])
+        self.assertEqual(len(SearchIndex.objects.search("zebra")), 1)
+
+        link.tags = ["giraffe"]
+        link.save()
+        self.assertEqual(len(SearchIndex.objects.search("zebra")), 0)
+        self.assertEqual(len(SearchIndex.objects.search("giraffe")), 1)
+
+        link.delete()
+        self.assertEqual(len(SearchIndex.objects.search("giraffe")), 0)
+        self.assertFalse(SearchIndex.objects.filter(item_id=link.id).exists())
+
+    def test_verify_and_backfill(self):
+        self.assertTrue(verify_search_index().clean)
+
+        SearchIndex.objects.all().delete()
+        drift = verify_search_index()
+        self.assertEqual(drift.missing, Link.objects.count() + Person.objects.count() + Project.objects.count())
+
+        backfill_search_index()
+        self.assertTrue(verify_search_index().clean)
+
+
+class SearchCacheTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.now = 0
+        self.cache = SearchCache(max_size=2, ttl=10, clock=lambda: self.now)
+
+    def test_hits_and_misses(self):
+        self.assertEqual(self.cache.get_or_set("a", lambda: 1), 1)
+        self.assertEqual(self.cache.get_or_set("a", lambda: 2), 1)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_evicts_least_recently_used(self):
+        self.cache.get_or_set("a", lambda: 1)
+        self.cache.get_or_set("b", lambda: 2)
+        self.cache.get_or_set("a", lambda: 1)
+        self.cache.get_or_set("c", lambda: 3)
+        self.assertEqual(self.cache.get_or_set("b", lambda: "recomputed"), "recomputed")
+        self.assertEqual(self.cache.get_or_set("a", lambda: "recomputed"), "recomputed")
+
+    def test_expires(self):
+        self.cache.get_or_set("a", lambda: 1)
+        self.now = 11
+        self.assertEqual(self.cache.get_or_set("a", lambda: 2), 2)
+
+    def test_invalidate(self):
+        self.cache.get_or_set("a", lambda: 1)
+        self.cache.invalidate()
+        self.assertEqual(len(self.cache), 0)
+        self.assertEqual(self.cache.get_or_set("a", lambda: 2), 2)
+
+    def test_write_during_compute_is_not_cached(self):
+        def compute():
+            self.cache.invalidate()
+            return 1
+        self.cache.get_or_set("a", compute)
+        self.assertEqual(len(self.cache), 0)
+
+
+class SearchCacheInvalidationTestCase(TestCase):
+
+    fixtures = ["seed.yaml"]
+
+    def test_writes_invalidate_search(self):
+        self.assertEqual(len(SearchIndex.objects.search("okapi")), 0)
+        hits = search_cache.hits
+        self.assertEqual(len(SearchIndex.objects.search("okapi")), 0)
+        self.assertEqual(search_cache.hits, hits + 1)
+
+        link = Link.objects.create(title="Okapi", url="https://okapi.example.com", tags=[])
+        self.assertEqual(len(SearchIndex.objects.search("okapi")), 1)
+
+        link.delete()
+        self.assertEqual(len(SearchIndex.objects.search("okapi")), 0)
+
+
+class ClickCountTestCase(TransactionTestCase):
+
+    def test_concurrent_clicks(self):
+        link = Link.objects.create(title="Clicked", url="https://clicked.example.com", tags=[])
+
+        def click(_):
+            try:
+                Link.objects.record_click(link.id)
+            finally:
+                close_old_connections()
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(click, range(100)))
+
+        link.refresh_from_db()
+        self.assertEqual(link.click_count, 100)
+        self.assertEqual(SearchIndex.objects.get(item_id=link.id).click_count, 100)
+
+    def test_missing_link(self):
+        with self.assertRaises(Link.DoesNotExist):
+            Link.objects.record_click(uuid.uuid4())
+
+
+class JobQueueTestCase(TestCase):
+
+    def setUp(self):
+        self.calls = []
+
+        def flaky(fail_times):
+            self.calls.append(fail_times)
+            if len(self.calls) <= fail_times:
+                raise RuntimeError("Upstream timed out")
+            return {"calls": len(self.calls)}
+
+        patcher = patch.dict(jobs.handlers, {"flaky": (flaky, 3)})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_copy_edit_job(self):
+        result = schema.execute_sync('mutation { copyEditJob(text: "Draft", editorType: "simple") { id status } }')
+        self.assertIsNone(result.errors)
+        job = result.data["copyEditJob"]
+        self.assertEqual(job["status"], "queued")
+
+        llm = RecordingChatModel(messages=iter([AIMessage(content="Edited")]))
+        # Closing connections would end the test case's transaction
+        with patch.object(assistant, "copy_editor_llm", llm), patch.object(jobs, "close_old_connections"):
+            self.assertEqual(jobs.work(burst=True), 1)
+
+        result = schema.execute_sync('query ($id: ID!) { job(pk: $id) { status result attempts } }', {"id": job["id"]})
+        self.assertEqual(result.data["job"], {"status": "succeeded", "result": {"text": "Edited"}, "attempts": 1})
+
+    def test_failures_retry_with_backoff(self):
+        job = jobs.enqueue("flaky", fail_times=1)
+        jobs.run(jobs.claim())
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertIn("Upstream timed out", job.error)
+        self.assertGreater(job.run_after, timezone.now())
+
+        # Not due yet
+        self.assertIsNone(jobs.claim())
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        jobs.run(jobs.claim())
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.result, job.attempts, job.error), (Job.SUCCEEDED, {"calls": 2}, 2, ""))
+
+    def test_gives_up_after_max_attempts(self):
+        job = jobs.enqueue("flaky", fail_times=10)
+        for _ in range(3):
+            Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+            jobs.run(jobs.claim())
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 3))
+        self.assertIsNotNone(job.finished_at)
+
+    @override_settings(JOB_TIMEOUT=60)
+    def test_stale_jobs_are_requeued(self):
+        job = jobs.enqueue("flaky", fail_times=0)
+        jobs.claim()
+        self.assertEqual(jobs.requeue_stale(), 0)
+        Job.objects.filter(pk=job.pk).update(started_at=timezone.now() - timedelta(minutes=5))
+        self.assertEqual(jobs.requeue_stale(), 1)
+        self.assertEqual(jobs.claim().pk, job.pk)
+
+    @override_settings(JOB_TIMEOUT=60)
+    def test_stale_jobs_out_of_attempts_fail(self):
+        with patch.dict(jobs.handlers, {"once": (lambda: None, 1)}):
+            job = jobs.enqueue("once")
+        jobs.claim()
+        Job.objects.filter(pk=job.pk).update(started_at=timezone.now() - timedelta(minutes=5))
+
+        self.assertEqual(jobs.requeue_stale(), 0)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 1))
+        self.assertIn("Timed out", job.error)
+        self.assertIsNone(jobs.claim())
+
+    @override_settings(JOB_TIMEOUT=60)
+    def test_taken_over_job_keeps_new_outcome(self):
+        job = jobs.enqueue("flaky", fail_times=0)
+        slow = jobs.claim()
+        Job.objects.filter(pk=job.pk).update(started_at=timezone.now() - timedelta(minutes=5))
+        jobs.requeue_stale()
+        current = jobs.claim()
+
+        # The first worker finally finishes, after the job was handed to another
+        jobs.run(slow)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.RUNNING, 2))
+
+        jobs.run(current)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.SUCCEEDED, 2))
+
+    def test_unknown_kind(self):
+        with self.assertRaises(ValueError):
+            jobs.enqueue("missing")
+
+    def test_worker_survives_database_errors(self):
+        job = jobs.enqueue("flaky", fail_times=0)
+        # KeyboardInterrupt stops the worker like it would in production
+        claim = Mock(side_effect=[OperationalError("server closed the connection"), jobs.claim(), KeyboardInterrupt])
+        with patch.object(jobs, "claim", claim), patch.object(jobs, "close_old_connections") as close, \
+                patch.object(jobs.time, "sleep") as sleep:
+            with self.assertRaises(KeyboardInterrupt), self.assertLogs("success.jobs", "ERROR") as logs:
+                jobs.work(poll_interval=0)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.SUCCEEDED)
+        self.assertEqual(close.call_count, 3)
+        sleep.assert_called_once_with(0)
+        self.assertIn("server closed the connection", logs.output[0])
+
+
+class JobWorkerConcurrencyTestCase(TransactionTestCase):
+
+    def test_workers_never_share_a_job(self):
+        ran = []
+
+        def record(number):
+            time.sleep(0.01)
+            ran.append(number)
+            return number
+
+        with patch.dict(jobs.handlers, {"record": (record, 1)}):
+            for number in range(40):
+                jobs.enqueue("record", number=number)
+
+            def worker(_):
+                try:
+                    return jobs.work(burst=True)
+                finally:
+                    close_old_connections()
+
+            with ThreadPoolExecutor(max_workers=4) as pool:
+                counts = list(pool.map(worker, range(4)))
+
+        self.assertEqual(sum(counts), 40)
+        self.assertEqual(sorted(ran), list(range(40)))
+        self.assertEqual(Job.objects.filter(status=Job.SUCCEEDED).count(), 40)
+
+
+class FakeEventsRequest:
+
+    def __init__(self, service, calendar_id, params):
+        self.service = service
+        self.calendar_id = calendar_id
+        self.params = params
+
+    def fetch(self):
+        self.service.requests.append((self.calendar_id, self.params))
+        result = self.service.calendars[self.calendar_id]
+        if callable(result):
+            result = result(self.params)
+        if isinstance(result, Exception):
+            raise result
+        if isinstance(result, list):
+            result = {"items": result, "nextSyncToken": f"{self.calendar_id}-sync"}
+        return json.loads(json.dumps(result))
+
+    def execute(self, http=None):
+        self.service.round_trips.append([self.calendar_id])
+        return self.fetch()
+
+
+class FakeBatch:
+
+    def __init__(self, service, callback):
+        self.service = service
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, request_id=None):
+        self.requests.append((request_id, request))
+
+    def execute(self, http=None):
+        self.service.round_trips.append([request.calendar_id for _, request in self.requests])
+        if self.service.barrier:
+            self.service.barrier.wait(timeout=5)
+        if self.service.batch_error:
+            raise self.service.batch_error
+        for request_id, request in self.requests:
+            try:
+                self.callback(request_id, request.fetch(), None)
+            except Exception as e:
+                self.callback(request_id, None, e)
+
+
+class FakeCalendarService:
+    """Stands in for a Google Calendar API client
+
+    Each calendar answers events().list() with a list of events, an
+    exception to raise, or a function of the request parameters.
+    """
+
+    def __init__(self, calendars, batch_error=None, barrier=None):
+        self.calendars = calendars
+        self.batch_error = batch_error
+        # Batches wait here for each other, so they only get through if they run at once
+        self.barrier = barrier
+        self.round_trips = []
+        self.requests = []
+
+    def events(self):
+        return self
+
+    def list(self, calendarId, **params):
+        return FakeEventsRequest(self, calendarId, params)
+
+    def new_batch_http_request(self, callback=None):
+        return FakeBatch(self, callback)
+
+
+def all_day_event(event_id, days=1, **fields):
+    """An all day event so many days from today in the default notification timezone"""
+    day = datetime.now(ZoneInfo("America/New_York")).date() + timedelta(days=days)
+    return {"id": event_id, "start": {"date": day.isoformat()}, "end": {"date": (day + timedelta(days=1)).isoformat()}, **fields}
+
+
+def batch_response(*parts):
+    """A multipart batch response body, one (status, payload) per batched call"""
+    body = ""
+    for index, (status, payload) in enumerate(parts):
+        body += (
+            "--batch_boundary\r\n"
+            "Content-Type: application/http\r\n"
+            "Content-Transfer-Encoding: binary\r\n"
+            f"Content-ID: <response-batch + {index}>\r\n\r\n"
+            f"HTTP/1.1 {status}\r\n"
+            "Content-Type: application/json\r\n\r\n"
+            f"{json.dumps(payload)}\r\n"
+        )
+    return ({"status": "200", "content-type": 'multipart/mixed; boundary="batch_boundary"'}, body + "--batch_boundary--")
+
+
+@override_settings(CALENDAR_ENCRYPTION_KEY=Fernet.generate_key(), CALENDAR_FETCH_WORKERS=8)
+class CalendarServiceTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        for account in ("work", "home"):
+            creds = GoogleCredentials.objects.create(account_id=account, account_name=account, encrypted_credentials="")
+            for number in range(3):
+                CalendarSettings.objects.create(
+                    google_credentials=creds, calendar_id=f"{account}-{number}", calendar_name=f"{account} {number}",
+                )
+
+    def setUp(self):
+        client_cache.invalidate()
+
+    def fetch(self, calendars, service=None, http=None):
+        service = service or FakeCalendarService(calendars)
+        calendar_service = CalendarService()
+        with patch.object(CalendarService, "_load_credentials", return_value=(Credentials(token="token"), False)), \
+                patch.object(CalendarService, "_build_service", return_value=service), \
+                patch.object(CalendarService, "_authorized_http", return_value=http):
+            events, _ = calendar_service.get_tomorrow_events()
+        return events, calendar_service.fetch_timings
+
+    def calendars(self):
+        return {
+            f"{account}-{number}": [all_day_event(f"{account}-{number}-event")]
+            for account in ("work", "home") for number in range(3)
+        }
+
+    def test_fetches_accounts_concurrently_in_batches(self):
+        service = FakeCalendarService(self.calendars(), barrier=threading.Barrier(2))
+        events, timings = self.fetch(None, service=service)
+
+        self.assertEqual(len(events), 6)
+        self.assertEqual(len(timings), 6)
+        self.assertFalse(any(timing.error for timing in timings))
+        # One round trip per account, both accounts at once. Run one after the
+        # other the barrier would break and each calendar be fetched alone.
+        self.assertEqual(sorted(len(calendars) for calendars in service.round_trips), [3, 3])
+
+    def test_failed_batch_falls_back_to_single_requests(self):
+        service = FakeCalendarService(self.calendars(), batch_error=RuntimeError("batch down"))
+        events, timings = self.fetch(None, service=service)
+
+        self.assertEqual(len(events), 6)
+        self.assertFalse(any(timing.error for timing in timings))
+        self.assertEqual(len(service.round_trips), 2 + 6)
+
+    def test_clients_are_reused_across_runs(self):
+        service = FakeCalendarService(self.calendars())
+        with patch.object(CalendarService, "_load_credentials", return_value=(Credentials(token="token"), False)) as load, \
+                patch.object(CalendarService, "_build_service", return_value=service) as build_service:
+            for _ in range(3):
+                events, _ = CalendarService().get_tomorrow_events()
+                self.assertEqual(len(events), 6)
+
+        self.assertEqual(load.call_count, 2)
+        self.assertEqual(build_service.call_count, 2)
+        self.assertEqual(len(client_cache), 2)
+
+    def test_refresh_invalidates_cached_client(self):
+        expired = Credentials(
+            token="old", refresh_token="refresh", token_uri="https://oauth2.googleapis.com/token",
+            client_id="client", client_secret="secret", expiry=datetime(2000, 1, 1),
+        )
+        refreshed = Credentials(
+            token="new", refresh_token="refresh", token_uri="https://oauth2.googleapis.com/token",
+            client_id="client", client_secret="secret",
+        )
+        service = FakeCalendarService(self.calendars())
+        with patch.object(CalendarService, "_load_credentials", side_effect=[(expired, False), (expired, False), (refreshed, True), (refreshed, True)]) as load, \
+                patch.object(CalendarService, "_build_service", return_value=service) as build_service:
+            calendar_service = CalendarService()
+            calendar_service.get_tomorrow_events()
+            # The cached clients' tokens have expired, so both accounts load and refresh again
+            calendar_service.get_tomorrow_events()
+            calendar_service.get_tomorrow_events()
+
+        self.assertEqual(load.call_count, 4)
+        self.assertEqual(build_service.call_count, 4)
+        for google_creds in GoogleCredentials.objects.all():
+            self.assertEqual(calendar_service.decrypt_credentials(google_creds.encrypted_credentials)["token"], "new")
+            self.assertIs(client_cache.get(google_creds).credentials, refreshed)
+
+    def test_service_uses_bundled_discovery_document(self):
+        http = HttpMockSequence([])
+        service = CalendarService()._build_service(http)
+        self.assertEqual(http.request_sequence, [])
+        self.assertTrue(hasattr(service, "events"))
+
+    def test_batch_over_http(self):
+        GoogleCredentials.objects.filter(account_id="home").update(is_active=False)
+        http = HttpMockSequence([batch_response(
+            ("200 OK", {"items": [all_day_event("a")], "nextSyncToken": "work-0-sync"}),
+            ("404 Not Found", {"error": {"code": 404, "message": "Not Found"}}),
+            ("200 OK", {"items": [all_day_event("b"), all_day_event("c")], "nextSyncToken": "work-2-sync"}),
+        )])
+        service = build("calendar", "v3", http=http, static_discovery=True)
+
+        events, timings = self.fetch(None, service=service, http=http)
+
+        self.assertEqual(len(http.request_sequence), 1)
+        uri, method, body, _ = http.request_sequence[0]
+        self.assertEqual((uri, method), ("https://www.googleapis.com/batch/calendar/v3", "POST"))
+        for number in range(3):
+            self.assertIn(f"/calendars/work-{number}/events", body)
+        self.assertEqual([(event["id"], event["calendarId"]) for event in events], [("a", "work-0"), ("b", "work-2"), ("c", "work-2")])
+        self.assertEqual([timing.error is not None for timing in timings], [False, True, False])
+
+    def test_result_order_is_deterministic(self):
+        events, timings = self.fetch(self.calendars())
+        expected = [f"{account}-{number}" for account in ("home", "work") for number in range(3)]
+        self.assertEqual([event["calendarId"] for event in events], expected)
+        self.assertEqual([timing.calendar_name for timing in timings], [name.replace("-", " ") for name in expected])
+
+    def test_failing_calendar_is_isolated(self):
+        calendars = self.calendars()
+        calendars["work-1"] = RuntimeError("boom")
+        calendars["home-0"].append(all_day_event("location", eventType="workingLocation"))
+
+        events, timings = self.fetch(calendars)
+
+        self.assertEqual(len(events), 5)
+        self.assertNotIn("work-1", [event["calendarId"] for event in events])
+        failed = [timing for timing in timings if timing.error]
+        self.assertEqual([(timing.calendar_name, timing.error) for timing in failed], [("work 1", "boom")])
+
+    def test_incremental_sync(self):
+        calendars = self.calendars()
+        calendars["work-0"] = lambda params: (
+            {"items": [
+                all_day_event("work-0-event", summary="Moved", days=2),
+                all_day_event("cancelled", status="cancelled"),
+                all_day_event("new", summary="New"),
+            ], "nextSyncToken": "work-0-sync-2"}
+            if params.get("syncToken") == "work-0-sync"
+            else [all_day_event("work-0-event"), all_day_event("cancelled")]
+        )
+        service = FakeCalendarService(calendars)
+        self.fetch(None, service=service)
+        self.assertEqual(CalendarEvent.objects.count(), 7)
+        self.assertTrue(all("timeMin" in params and "timeMax" in params and "syncToken" not in params
+                            for _, params in service.requests))
+
+        service.requests.clear()
+        events, timings = self.fetch(None, service=service)
+
+        # Only deltas are requested once every calendar has a sync token
+        self.assertEqual(len(service.requests), 6)
+        self.assertTrue(all(params["syncToken"] == f"{calendar_id}-sync" and "timeMin" not in params
+                            for calendar_id, params in service.requests))
+        self.assertEqual(
+            sorted(event["id"] for event in events if event["calendarId"] == "work-0"),
+            ["new"],
+        )
+        work = CalendarSettings.objects.get(calendar_id="work-0")
+        self.assertEqual(work.sync_token, "work-0-sync-2")
+        self.assertEqual(
+            dict(work.events.values_list("event_id", "data__summary")),
+            {"work-0-event": "Moved", "new": "New"},
+        )
+        # The other calendars' events were kept as they were
+        self.assertEqual(CalendarEvent.objects.count(), 7)
+
+    def test_expired_sync_token_runs_full_sync(self):
+        CalendarSettings.objects.update(sync_token="stale", synced_until=timezone.now() + timedelta(days=90))
+        calendar = CalendarSettings.objects.get(calendar_id="work-0")
+        CalendarEvent.objects.create(calendar=calendar, event_id="gone", start=timezone.now(), end=timezone.now(), data={})
+        gone = HttpError(httplib2.Response({"status": 410}), b"Gone")
+        calendars = {
+            calendar_id: (lambda items: lambda params: gone if params.get("syncToken") else items)(items)
+            for calendar_id, items in self.calendars().items()
+        }
+        service = FakeCalendarService(calendars)
+
+        events, timings = self.fetch(None, service=service)
+
+        self.assertEqual(len(events), 6)
+        self.assertFalse(any(timing.error for timing in timings))
+        self.assertFalse(CalendarEvent.objects.filter(event_id="gone").exists())
+        self.assertEqual(set(CalendarSettings.objects.values_list("sync_token", flat=True)),
+                         {f"{calendar_id}-sync" for calendar_id in calendars})
+
+    def test_sync_follows_pages(self):
+        calendars = self.calendars()
+        calendars["home-0"] = lambda params: (
+            [all_day_event("second")] if params.get("pageToken") == "2"
+            else {"items": [all_day_event("first")], "nextPageToken": "2"}
+        )
+        service = FakeCalendarService(calendars)
+
+        events, _ = self.fetch(None, service=service)
+
+        self.assertEqual([event["id"] for event in events if event["calendarId"] == "home-0"], ["first", "second"])
+        self.assertEqual(CalendarSettings.objects.get(calendar_id="home-0").sync_token, "home-0-sync")
+
+    def test_events_outside_tomorrow_are_stored_but_not_returned(self):
+        calendars = self.calendars()
+        calendars["home-1"] = [all_day_event("today", days=0), all_day_event("later", days=3)]
+
+        events, _ = self.fetch(calendars)
+
+        self.assertNotIn("home-1", [event["calendarId"] for event in events])
+        self.assertEqual(CalendarEvent.objects.filter(calendar__calendar_id="home-1").count(), 2)
+
+    @override_settings(CALENDAR_SYNC_FUTURE_DAYS=30)
+    def test_events_past_the_horizon_are_pruned(self):
+        calendar = CalendarSettings.objects.get(calendar_id="home-1")
+        later = timezone.now() + timedelta(days=40)
+        CalendarEvent.objects.create(calendar=calendar, event_id="later", start=later, end=later, data={})
+        service = FakeCalendarService(self.calendars())
+
+        self.fetch(None, service=service)
+
+        self.assertFalse(CalendarEvent.objects.filter(event_id="later").exists())
+        calendar.refresh_from_db()
+        self.assertAlmostEqual(calendar.synced_until, timezone.now() + timedelta(days=30), delta=timedelta(minutes=1))
+
+    @override_settings(CALENDAR_SYNC_FUTURE_DAYS=30)
+    def test_full_sync_once_the_horizon_runs_low(self):
+        CalendarSettings.objects.update(sync_token="sync", synced_until=timezone.now() + timedelta(days=20))
+        CalendarSettings.objects.filter(calendar_id="work-0").update(synced_until=timezone.now() + timedelta(days=10))
+        service = FakeCalendarService(self.calendars())
+
+        self.fetch(None, service=service)
+
+        full = {calendar_id for calendar_id, params in service.requests if "timeMax" in params}
+        self.assertEqual(full, {"work-0"})
+        self.assertTrue(all(params.get("syncToken") == "sync"
+                            for calendar_id, params in service.requests if calendar_id != "work-0"))
+
+
+@override_settings(CALENDAR_ENCRYPTION_KEY=Fernet.generate_key(), CALENDAR_TOKEN_REFRESH_MINUTES=20)
+class CalendarCredentialsTestCase(TestCase):
+
+    def setUp(self):
+        credential_cache.invalidate()
+        client_cache.invalidate()
+        self.calendar_service = CalendarService()
+
+    def account(self, account_id, expires_in):
+        expiry = datetime.now(dt_timezone.utc).replace(tzinfo=None) + expires_in
+        credentials = Credentials(
+            token="old", refresh_token="refresh", token_uri="https://oauth2.googleapis.com/token",
+            client_id="client", client_secret="secret", expiry=expiry,
+        )
+        return GoogleCredentials.objects.create(
+            account_id=account_id, account_name=account_id,
+            encrypted_credentials=self.calendar_service.encrypt_credentials(self.calendar_service._credentials_dict(credentials)),
+        )
+
+    def fake_refresh(self, credentials, request):
+        credentials.token = "new"
+        credentials.expiry = datetime.now(dt_timezone.utc).replace(tzinfo=None) + timedelta(hours=1)
+
+    def test_credentials_are_decrypted_once(self):
+        google_creds = self.account("work", timedelta(hours=1))
+        with patch.object(CalendarService, "decrypt_credentials", autospec=True,
+                          side_effect=CalendarService.decrypt_credentials) as decrypt:
+            for _ in range(3):
+                credentials, refreshed = self.calendar_service._load_credentials(google_creds)
+            self.assertEqual(decrypt.call_count, 1)
+            self.assertEqual(credentials.token, "old")
+            self.assertFalse(refreshed)
+
+            # New credentials in the database are never answered from the cache
+            google_creds.encrypted_credentials = self.account("home", timedelta(hours=1)).encrypted_credentials
+            self.calendar_service._load_credentials(google_creds)
+            self.assertEqual(decrypt.call_count, 2)
+
+    def test_credential_cache_expires(self):
+        now = [0.0]
+        cache = CredentialCache(ttl=10, clock=lambda: now[0])
+        google_creds = self.account("work", timedelta(hours=1))
+        decrypt = Mock(return_value={"token": "old"})
+        cache.get(google_creds, decrypt)
+        now[0] = 9
+        cache.get(google_creds, decrypt)
+        now[0] = 11
+        self.assertEqual(cache.get(google_creds, decrypt), {"token": "old"})
+        self.assertEqual(decrypt.call_count, 2)
+
+    def test_refresh_tokens_renews_only_expiring_tokens(self):
+        self.account("soon", timedelta(minutes=5))
+        self.account("later", timedelta(minutes=50))
+        with patch.object(Credentials, "refresh", autospec=True, side_effect=self.fake_refresh):
+            refreshed, failed = self.calendar_service.refresh_tokens()
+
+        self.assertEqual((refreshed, failed), (["soon"], []))
+        tokens = {
+            google_creds.account_id: self.calendar_service.decrypt_credentials(google_creds.encrypted_credentials)["token"]
+            for google_creds in GoogleCredentials.objects.all()
+        }
+        self.assertEqual(tokens, {"soon": "new", "later": "old"})
+
+        # The refreshed credentials are served from memory, the daily run does no refresh
+        google_creds = GoogleCredentials.objects.get(account_id="soon")
+        with patch.object(CalendarService, "decrypt_credentials") as decrypt, \
+                patch.object(Credentials, "refresh") as refresh:
+            credentials, was_refreshed = self.calendar_service._load_credentials(google_creds)
+        decrypt.assert_not_called()
+        refresh.assert_not_called()
+        self.assertEqual((credentials.token, was_refreshed), ("new", False))
+
+    def test_refresh_failure_is_reported(self):
+        self.account("broken", timedelta(minutes=1))
+        with patch.object(Credentials, "refresh", side_effect=RuntimeError("revoked")):
+            refreshed, failed = self.calendar_service.refresh_tokens()
+        self.assertEqual((refreshed, failed), ([], ["broken"]))
+
+    def test_refresh_writes_back_only_changed_fields(self):
+        google_creds = self.account("work", timedelta(minutes=10))
+        updated_at = google_creds.updated_at
+        # Renamed elsewhere while this instance was held
+        GoogleCredentials.objects.filter(pk=google_creds.pk).update(account_name="Renamed")
+
+        credentials, _ = self.calendar_service._load_credentials(google_creds)
+        self.fake_refresh(credentials, None)
+        self.calendar_service._store_refreshed_credentials(google_creds, credentials)
+
+        google_creds.refresh_from_db()
+        self.assertEqual(google_creds.account_name, "Renamed")
+        self.assertEqual(google_creds.updated_at, updated_at)
+        self.assertIsNotNone(google_creds.last_used)
+        self.assertEqual(self.calendar_service.decrypt_credentials(google_creds.encrypted_credentials)["token"], "new")
+
+
+class LinkPopularityTestCase(TestCase):
+
+    def test_recent_clicks_outrank_old_clicks(self):
+        old = Link.objects.create(title="Popular long ago", url="https://old.example.com", tags=["wiki"])
+        recent = Link.objects.create(title="Popular lately", url="https://recent.example.com", tags=["wiki"])
+        Link.objects.filter(pk=old.pk).update(
+            click_count=50, popularity=50, popularity_updated_at=timezone.now() - timedelta(days=365)
+        )
+        for _ in range(3):
+            Link.objects.record_click(recent.pk)
+        search_cache.invalidate()
+
+        results = SearchIndex.objects.search("wiki", "link")
+        self.assertEqual([link.pk for link in results], [recent.pk, old.pk])
+
+    def test_record_click(self):
+        link = Link.objects.create(title="Clicked", url="https://clicked.example.com", tags=[])
+        Link.objects.record_click(link.pk)
+        link = Link.objects.record_click(link.pk)
+
+        self.assertEqual(link.click_count, 2)
+        self.assertAlmostEqual(link.popularity, 2, places=3)
+        self.assertEqual(link.clicks.count(), 2)
+
+    def test_recompute_popularity(self):
+        link = Link.objects.create(title="Clicked", url="https://clicked.example.com", tags=[])
+        LinkClick.objects.create(link=link)
+        half_life_ago = timezone.now() - timedelta(days=settings.LINK_POPULARITY_HALF_LIFE_DAYS)
+        LinkClick.objects.create(link=link)
+        LinkClick.objects.filter(pk=link.clicks.last().pk).update(clicked_at=half_life_ago)
+
+        Link.objects.recompute_popularity()
+        link.refresh_from_db()
+        self.assertAlmostEqual(link.popularity, 1.5, places=3)
+
+    def test_recompute_keeps_clicks_from_before_events(self):
+        link = Link.objects.create(title="Old favourite", url="https://old.example.com", tags=[], click_count=5)
+        Link.objects.record_click(link.pk)
+        half_life_ago = timezone.now() - timedelta(days=settings.LINK_POPULARITY_HALF_LIFE_DAYS)
+        MigrationRecorder.Migration.objects.filter(app="success", name="0026_link_popularity").update(applied=half_life_ago)
+
+        Link.objects.recompute_popularity()
+        link.refresh_from_db()
+        # The 5 migrated clicks have decayed from the migration, the recorded one is fresh
+        self.assertAlmostEqual(link.popularity, 3.5, places=3)
+
+
+class TagTestCase(TestCase):
+
+    fixtures = ["seed.yaml"]
+
+    def tag_counts(self):
+        return dict(Tag.objects.values_list('name', 'link_count'))
+
+    def test_tag_counts_follow_writes(self):
+        self.assertEqual(self.tag_counts(), {"mike": 1, "work": 1, "search": 2})
+
+        link = Link.objects.create(title="Docs", url="https://docs.example.com", tags=["work", "docs", "docs"])
+        self.assertEqual(self.tag_counts(), {"mike": 1, "work": 2, "search": 2, "docs": 1})
+
+        link.tags = ["search"]
+        link.save()
+        self.assertEqual(self.tag_counts(), {"mike": 1, "work": 1, "search": 3})
+
+        link.delete()
+        self.assertEqual(self.tag_counts(), {"mike": 1, "work": 1, "search": 2})
+        self.assertEqual(list(Link.objects.unique_tags()), ["mike", "search", "work"])
+
+
+class LinkListingTestCase(TestCase):
+
+    fixtures = ["seed.yaml"]
+
+    def query(self, query, **variables):
+        result = schema.execute_sync(query, variable_values=variables)
+        self.assertIsNone(result.errors)
+        return result.data
+
+    def test_tag_filters(self):
+        query = """
+            query Links($filters: LinkFilter) {
+                links(filters: $filters) { title }
+            }
+        """
+        links = self.query(query, filters={"tagsContains": ["mike", "work"]})["links"]
+        self.assertEqual([link["title"] for link in links], ["Success"])
+
+        links = self.query(query, filters={"tagsOverlap": ["mike", "search"]})["links"]
+        self.assertEqual(sorted(link["title"] for link in links), ["Bing", "Google", "Success"])
+
+    def test_links_page(self):
+        query = """
+            query LinksPage($after: String, $filters: LinkFilter) {
+                linksPage(first: 2, after: $after, filters: $filters) {
+                    totalCount
+                    pageInfo { hasNextPage endCursor }
+                    results { id }
+                }
+            }
+        """
+        first_page = self.query(query)["linksPage"]
+        self.assertEqual(first_page["totalCount"], 3)
+        self.assertEqual(len(first_page["results"]), 2)
+        self.assertTrue(first_page["pageInfo"]["hasNextPage"])
+
+        second_page = self.query(query, after=first_page["pageInfo"]["endCursor"])["linksPage"]
+        self.assertEqual(len(second_page["results"]), 1)
+        self.assertFalse(second_page["pageInfo"]["hasNextPage"])
+
+        seen = [link["id"] for link in first_page["results"] + second_page["results"]]
+        self.assertEqual(len(set(seen)), 3)
+
+        filtered = self.query(query, filters={"tagsContains": ["search"]})["linksPage"]
+        self.assertEqual(filtered["totalCount"], 2)
+
+
+class QueryCountTestCase(TestCase):
+
+    fixtures = ["seed.yaml"]
+
+    @classmethod
+    def setUpTestData(cls):
+        for person in Person.objects.all():
+            for day in range(1, 6):
+                PersonLog.objects.create(person=person, date=date(2024, 1, day), note=f"Note {day}")
+
+        for account in range(3):
+            credentials = GoogleCredentials.objects.create(
+                account_id=f"account-{account}", account_name=f"Account {account}", encrypted_credentials=""
+            )
+            for calendar in range(3):
+                CalendarSettings.objects.create(google_credentials=credentials, calendar_id=f"calendar-{calendar}")
+
+        conversation = AssistantConversation.objects.create(system_message="You are a person")
+        for turn in range(5):
+            AssistantMessage.objects.create(conversation=conversation, role="user", content=f"Message {turn}")
+
+    def assertQueryCount(self, count, query):
+        with self.assertNumQueries(count):
+            result = schema.execute_sync(query)
+        self.assertIsNone(result.errors)
+        return result.data
+
+    def test_people_with_logs(self):
+        data = self.assertQueryCount(2, """
+            query {
+                people {
+                    name
+                    logs(pagination: { offset: 0, limit: 1 }, order: { date: DESC }) {
+                        note
+                        person { name }
+                    }
+                }
+            }
+        """)
+        self.assertTrue(all(person["logs"][0]["note"] == "Note 5" for person in data["people"]))
+
+    def test_calendar_settings_with_credentials(self):
+        data = self.assertQueryCount(1, """
+            query {
+                calendarSettings { calendarId googleCredentials { accountName } }
+            }
+        """)
+        self.assertEqual(len(data["calendarSettings"]), 9)
+
+    def test_conversation_messages(self):
+        data = self.assertQueryCount(2, """
+            query {
+                assistantConversations {
+                    messages { content conversation { id } }
+                }
+            }
+        """)
+        messages = data["assistantConversations"][0]["messages"]
+        self.assertEqual([message["content"] for message in messages], [f"Message {turn}" for turn in range(5)])
+
+
+class ConversationListTestCase(TestCase):
+
+    query = """
+        query ($after: String) {
+            assistantConversationsPage(first: 2, after: $after) {
+                results { id previewText latestMessage { role content } }
+                pageInfo { hasNextPage endCursor }
+            }
+        }
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.conversations = []
+        for number in range(5):
+            conversation = AssistantConversation.objects.create(system_message="You are a person")
+            AssistantMessage.objects.create(conversation=conversation, role="user", content=f"Question {number} " + "x" * 60)
+            AssistantMessage.objects.create(conversation=conversation, role="assistant", content=f"Answer {number}")
+            cls.conversations.append(conversation)
+        cls.conversations.append(AssistantConversation.objects.create(system_message="Empty"))
+
+    def test_pages_newest_first_in_one_query_each(self):
+        seen, after = [], None
+        while True:
+            with self.assertNumQueries(1):
+                result = schema.execute_sync(self.query, variable_values={"after": after})
+            self.assertIsNone(result.errors)
+            page = result.data["assistantConversationsPage"]
+            seen.extend(page["results"])
+            if not page["pageInfo"]["hasNextPage"]:
+                break
+            after = page["pageInfo"]["endCursor"]
+
+        ordered = sorted(self.conversations, key=lambda c: (c.created_at, c.id), reverse=True)
+        self.assertEqual([c["id"] for c in seen], [str(c.id) for c in ordered])
+
+        by_id = {c["id"]: c for c in seen}
+        empty = by_id[str(self.conversations[-1].id)]
+        self.assertEqual(empty["previewText"], "Empty conversation")
+        self.assertIsNone(empty["latestMessage"])
+
+        first = by_id[str(self.conversations[0].id)]
+        self.assertEqual(first["previewText"], ("Question 0 " + "x" * 60)[:50] + "...")
+        self.assertEqual(first["latestMessage"], {"role": "assistant", "content": "Answer 0"})
+
+    def test_annotations_match_properties(self):
+        for annotated in AssistantConversation.objects.with_summary():
+            plain = AssistantConversation.objects.get(pk=annotated.pk)
+            self.assertEqual(annotated.preview_text, plain.preview_text)
+            self.assertEqual(getattr(annotated.latest_message, "pk", None), getattr(plain.latest_message, "pk", None))
+
+
+@tag("benchmark")
+@skipUnless(os.environ.get("RUN_BENCHMARKS"), "benchmarks run with RUN_BENCHMARKS=1")
+class SearchBenchmarkTestCase(TestCase):
+
+    def time_search(self, hits):
+        Link.objects.bulk_create(
+            Link(title=f"Benchmark {i}", url=f"https://bench.example.com/{i}", tags=["benchmark"])
+            for i in range(Link.objects.count(), hits)
+        )
+        # bulk_create skips post_save, and we want to time an uncached search anyway
+        search_cache.invalidate()
+        start = time.perf_counter()
+        results = SearchIndex.objects.search("benchmark", "link")
+        elapsed = time.perf_counter() - start
+        self.assertEqual(len(results), hits)
+        return elapsed
+
+    def test_hydration_scales_linearly(self):
+        per_hit = {}
+        for hits in (10, 100, 1000, 10000):
+            elapsed = self.time_search(hits)
+            per_hit[hits] = elapsed / hits
+
+        # Quadratic re-ordering would make each hit ~10x dearer at 10k than at 1k
+        self.assertLess(per_hit[10000], per_hit[1000] * 3)
+
+
+class TypeaheadTestCase(TestCase):
+
+    WORDS = ["alpha", "bravo", "charlie", "delta", "echo", "foxtrot", "golf", "hotel",
+             "india", "juliet", "kilo", "lima", "mike", "november", "oscar", "papa"]
+    ROWS = 2000
+
+    @classmethod
+    def setUpTestData(cls):
+        # Fill the index directly, typeahead never touches the source tables
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO success_search_index (item_type, item_id, title, body, body_vector, click_count, created_at)
+                SELECT 'link', md5(i::text)::uuid, title, title, to_tsvector('english', title), 0, now()
+                FROM (
+                    SELECT i, (%s::text[])[1 + i %% 16] || ' ' || (%s::text[])[1 + (i / 16) %% 16] || ' ' || md5(i::text) AS title
+                    FROM generate_series(1, %s) i
+                ) rows
+            """, [cls.WORDS, cls.WORDS, cls.ROWS])
+            cursor.execute("ANALYZE success_search_index")
+
+    def test_typeahead(self):
+        results = SearchIndex.objects.typeahead("mik nov", limit=5)
+        self.assertEqual(len(results), 5)
+        self.assertTrue(all("mike" in row["title"] and "november" in row["title"] for row in results))
+
+        self.assertEqual(SearchIndex.objects.typeahead("  "), [])
+
+
+@tag("benchmark")
+@skipUnless(os.environ.get("RUN_BENCHMARKS"), "benchmarks run with RUN_BENCHMARKS=1")
+class TypeaheadBenchmarkTestCase(TypeaheadTestCase):
+
+    ROWS = 100000
+
+    def test_typeahead_latency(self):
+        timings = []
+        for word in self.WORDS:
+            for prefix in (word[:1], word[:2], word[:3], f"{word[:3]} {self.WORDS[0][:2]}"):
+                start = time.perf_counter()
+                SearchIndex.objects.typeahead(prefix)
+                timings.append(time.perf_counter() - start)
+
+        timings.sort()
+        p95 = timings[int(len(timings) * 0.95)]
+        self.assertLess(p95, TYPEAHEAD_BUDGET)
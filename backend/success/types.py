@@ -1,7 +1,12 @@
 # types.py
+import base64
+import datetime
 import strawberry
+import strawberry_django
+from django.db.models import Q
 from strawberry import auto
-from typing import List, Optional
+import uuid
+from typing import Any, List, Optional, Union
 
 from . import models
 
@@ -14,6 +19,17 @@ class LinkFilter:
     id: auto
     url: auto
 
+    # Both are served by the GIN index on tags
+    @strawberry_django.filter_field
+    def tags_contains(self, value: List[str], prefix: str) -> Q:
+        """Links carrying every one of these tags"""
+        return Q(**{f"{prefix}tags__contains": value})
+
+    @strawberry_django.filter_field
+    def tags_overlap(self, value: List[str], prefix: str) -> Q:
+        """Links carrying any of these tags"""
+        return Q(**{f"{prefix}tags__overlap": value})
+
 @strawberry.django.type(models.Link, filters=LinkFilter, order=LinkOrder)
 class Link:
     id: auto
@@ -23,6 +39,41 @@ class Link:
     click_count: auto
     created_at: auto
 
+@strawberry.django.type(models.Tag)
+class Tag:
+    name: auto
+    link_count: auto
+
+def _encode_keyset_cursor(kind: str, instance) -> str:
+    return base64.b64encode(f"{kind}:{instance.created_at.isoformat()}|{instance.id}".encode()).decode()
+
+def _decode_keyset_cursor(kind: str, cursor: str):
+    try:
+        prefix, value = base64.b64decode(cursor).decode().split(":", 1)
+        created_at, instance_id = value.split("|")
+        if prefix != kind:
+            raise ValueError
+        return datetime.datetime.fromisoformat(created_at), uuid.UUID(instance_id)
+    except ValueError:
+        raise ValueError(f"Invalid {kind} cursor: {cursor}")
+
+def encode_link_cursor(link) -> str:
+    return _encode_keyset_cursor("link", link)
+
+def decode_link_cursor(cursor: str):
+    return _decode_keyset_cursor("link", cursor)
+
+@strawberry.type
+class LinkConnection:
+    results: List[Link]
+    page_info: 'PageInfo'
+
+    queryset: strawberry.Private[Any]
+
+    @strawberry_django.field
+    def total_count(self) -> int:
+        return self.queryset.count()
+
 @strawberry.django.input(models.Link)
 class LinkInput:
     title: auto
@@ -120,6 +171,73 @@ class SearchOrder:
     def sort_order(self):
         return self.direction == "desc"
 
+def encode_search_cursor(offset: int) -> str:
+    return base64.b64encode(f"search:{offset}".encode()).decode()
+
+def decode_search_cursor(cursor: str) -> int:
+    try:
+        prefix, offset = base64.b64decode(cursor).decode().split(":")
+        offset = int(offset)
+        if prefix != "search" or offset < 0:
+            raise ValueError
+        return offset
+    except ValueError:
+        raise ValueError(f"Invalid search cursor: {cursor}")
+
+@strawberry.type
+class TypeaheadResult:
+    id: strawberry.ID
+    type: str
+    title: str
+
+@strawberry.type
+class SearchCacheStats:
+    hits: int
+    misses: int
+    size: int
+    max_size: int
+    generation: int
+
+@strawberry.type
+class CopyEditCacheStats:
+    hits: int
+    misses: int
+    hit_rate: float
+    size: int
+
+@strawberry.type
+class AssistantUsageStats:
+    kind: str
+    calls: int
+    input_tokens: int
+    output_tokens: int
+    cache_read_tokens: int
+    cache_creation_tokens: int
+    duration_ms: int
+
+    @strawberry.field
+    def cache_hit_rate(self) -> float:
+        """Share of input tokens read from the prompt cache"""
+        return self.cache_read_tokens / self.input_tokens if self.input_tokens else 0.0
+
+@strawberry.type
+class PageInfo:
+    has_next_page: bool
+    end_cursor: Optional[str]
+
+@strawberry.type
+class SearchConnection:
+    results: List[Union[Link, Person]]
+    page_info: PageInfo
+
+    query: strawberry.Private[str]
+    item_type: strawberry.Private[Optional[str]]
+    mode: strawberry.Private[Optional[str]] = None
+
+    @strawberry_django.field
+    def total_count(self) -> int:
+        return models.SearchIndex.objects.search_count(self.query, self.item_type, self.mode)
+
 @strawberry.django.type(models.PromptTemplate)
 class PromptTemplate:
     id: auto
@@ -134,10 +252,28 @@ class AssistantConversation:
     description: auto
     created_at: auto
     updated_at: auto
-    messages: List['AssistantMessage']
+    # The reverse relation rather than the model property, so the optimizer can prefetch it
+    messages: List['AssistantMessage'] = strawberry_django.field(field_name='assistant_messages')
     latest_message: Optional['AssistantMessage']
     preview_text: str
 
+def encode_conversation_cursor(conversation) -> str:
+    return _encode_keyset_cursor("conversation", conversation)
+
+def decode_conversation_cursor(cursor: str):
+    return _decode_keyset_cursor("conversation", cursor)
+
+@strawberry.type
+class AssistantConversationConnection:
+    results: List[AssistantConversation]
+    page_info: 'PageInfo'
+
+    queryset: strawberry.Private[Any]
+
+    @strawberry_django.field
+    def total_count(self) -> int:
+        return self.queryset.count()
+
 @strawberry.django.type(models.AssistantMessage)
 class AssistantMessage:
     id: auto
@@ -153,6 +289,19 @@ class ScratchPad:
     body: auto
 
 
+@strawberry.django.type(models.Job)
+class Job:
+    id: auto
+    kind: auto
+    status: auto
+    result: auto
+    error: auto
+    attempts: auto
+    created_at: auto
+    started_at: auto
+    finished_at: auto
+
+
 ### Calendar and Notification Types
 
 @strawberry.django.type(models.GoogleCredentials)
@@ -170,6 +319,7 @@ class CalendarSettings:
     calendar_id: auto
     calendar_name: auto
     is_enabled: auto
+    synced_at: auto
     google_credentials: GoogleCredentials
 
 @strawberry.django.type(models.NotificationSettings)
@@ -15,11 +15,13 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path
-from strawberry.django.views import GraphQLView
+from strawberry.django.views import AsyncGraphQLView
 from .schema import schema
+from . import views
 
 
 urlpatterns = [
-    path('graphql', GraphQLView.as_view(schema=schema)),
+    path('graphql', AsyncGraphQLView.as_view(schema=schema)),
+    path('assistant/stream', views.assistant_stream),
     path('admin/', admin.site.urls),
 ]
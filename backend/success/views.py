@@ -0,0 +1,72 @@
+"""
+Plain HTTP views that do not fit the GraphQL schema.
+
+The assistant stream is an async view, so under ASGI (success.asgi) each
+open stream waits on the LLM without holding a worker thread.
+"""
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.http import HttpResponseBadRequest, HttpResponseNotAllowed, JsonResponse, StreamingHttpResponse
+
+from . import assistant
+from .models import AssistantConversation, AssistantMessage
+
+logger = logging.getLogger(__name__)
+
+
+def _event(name, data):
+    return f"event: {name}\ndata: {json.dumps(data)}\n\n"
+
+
+async def assistant_stream(request):
+    """
+    Stream an assistant reply as Server-Sent Events.
+
+    POST a JSON body with a request and either a conversationID to continue
+    or a system message to start a new conversation. The response sends a
+    conversation event, one token event per chunk of the reply and a done
+    event carrying the saved message, or an error event if the reply fails
+    part way through.
+    """
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    try:
+        body = json.loads(request.body)
+        text = body['request']
+    except (ValueError, KeyError):
+        return HttpResponseBadRequest('Expected a JSON body with a request')
+
+    if body.get('conversationID'):
+        try:
+            conversation = await AssistantConversation.objects.aget(pk=body['conversationID'])
+        except ValidationError:
+            return HttpResponseBadRequest('Expected conversationID to be a UUID')
+        except AssistantConversation.DoesNotExist:
+            return JsonResponse({'error': 'Conversation not found'}, status=404)
+    else:
+        conversation = await AssistantConversation.objects.acreate(
+            system_message=body.get('system', ''),
+            description=''
+        )
+
+    async def events():
+        yield _event('conversation', {'id': str(conversation.id)})
+        try:
+            async for item in assistant.stream_message(conversation, text):
+                if isinstance(item, AssistantMessage):
+                    yield _event('done', {'id': str(item.id), 'createdAt': item.created_at.isoformat()})
+                else:
+                    yield _event('token', {'text': item})
+        except Exception as e:
+            # The database log handler is sync only
+            await sync_to_async(logger.error)('Assistant stream for %s failed', conversation.id, exc_info=e)
+            yield _event('error', {'message': 'The assistant could not finish its reply'})
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop proxies such as nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -7,7 +7,7 @@ import { Box, Link, Card, Grid, Avatar, Typography, CardContent } from '@mui/mat
 //
 import Iconify from '~/components/Iconify';
 import EditMenu from '~/components/EditMenu';
-import { useSubmit, useFetcher } from '@remix-run/react';
+import { Link as RouterLink, useSubmit, useFetcher } from '@remix-run/react';
 import { fDate } from '~/utils/formatTime';
 
 // ----------------------------------------------------------------------
@@ -206,7 +206,7 @@ export default function LinkCard({ item, large = false, latest = false }) {
                 }}
               >
                 <Iconify icon={'bi:hash'} sx={{ width: 16, height: 16, mr: 0.5 }} />
-                <Typography variant="caption">{tag}</Typography>
+                <Typography variant="caption" color="inherit" component={RouterLink} to={`/links?tag=${encodeURIComponent(tag)}`} sx={{ textDecoration: 'none' }}>{tag}</Typography>
               </Box>
             ))}
           </TagStyle>
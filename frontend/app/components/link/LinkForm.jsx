@@ -80,7 +80,7 @@ export default function LinkForm({path, prefilledModel, globalTags = [], checkUr
     useEffect(() => {
         if (urlChecker.data && urlChecker.data.search) {
             // Find an exact URL match in the search results
-            const exactMatch = urlChecker.data.search.find(
+            const exactMatch = urlChecker.data.search.results.find(
                 link => link.url.toLowerCase() === formik.values.url.toLowerCase()
             );
             setExistingLink(exactMatch || null);
@@ -1,9 +1,9 @@
 import { json, redirect } from "@remix-run/node";
-import { useLoaderData, Link, useFetcher } from "@remix-run/react";
+import { useLoaderData, Link, useRevalidator } from "@remix-run/react";
 import { NoSsr } from '@mui/base';
 import dayjs from 'dayjs';
 import { useTheme } from '@mui/material/styles';
-import { useState } from 'react';
+import { useEffect, useState } from 'react';
 import { useFormik } from 'formik';
 
 import Page from '~/components/Page';
@@ -40,6 +40,7 @@ import AccordionSummary from '@mui/material/AccordionSummary';
 import AccordionDetails from '@mui/material/AccordionDetails';
 import ExpandMoreIcon from '@mui/icons-material/ExpandMore';
 import { jsonToFormData, formDataToJson } from '~/utils/formUtils';
+import { streamAssistant } from '~/utils/assistantStream';
 
 const ConversationQuery = gql`
 query GetConversation($conversationId: ID!){
@@ -169,20 +170,41 @@ function ChatMessage({ message, role, datetime, rawText }) {
 
 export default function ConversationDetail(){
     const { assistantConversation } = useLoaderData();
-    const fetcher = useFetcher();
+    const revalidator = useRevalidator();
     const [isAsking, setIsAsking] = useState(false);
+    // The request being answered and the reply streamed so far
+    const [pending, setPending] = useState(null);
+
+    // Saved messages replace the streamed ones once the conversation reloads
+    useEffect(() => {
+        setPending(null);
+        setIsAsking(false);
+    }, [assistantConversation.messages.length]);
 
     const formik = useFormik({
         initialValues: {
             request: ''
         },
-        onSubmit: (values) => {
+        onSubmit: async (values) => {
             setIsAsking(true);
-            fetcher.submit(jsonToFormData(values), {
-                method: "POST"
-            });
+            setPending({ request: values.request, reply: '' });
             // Clear the form after submission
             formik.resetForm();
+            try {
+                await streamAssistant({
+                    conversationID: assistantConversation.id,
+                    request: values.request
+                }, {
+                    token: ({ text }) => setPending((current) => ({ ...current, reply: current.reply + text })),
+                    done: () => revalidator.revalidate()
+                });
+            } catch (error) {
+                console.error('Error streaming assistant reply:', error);
+                setPending(null);
+                setIsAsking(false);
+                // The request may have been saved before the reply failed
+                revalidator.revalidate();
+            }
         }
     });
 
@@ -226,6 +248,14 @@ export default function ConversationDetail(){
                             rawText={msg.content}
                         />
                     ))}
+                    {pending && (
+                        <>
+                            <ChatMessage message={pending.request} role="user" rawText={pending.request} />
+                            {pending.reply && (
+                                <ChatMessage message={pending.reply} role="assistant" rawText={pending.reply} />
+                            )}
+                        </>
+                    )}
                 </Box>
             </Paper>
 
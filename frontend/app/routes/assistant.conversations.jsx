@@ -14,30 +14,42 @@ import List from '@mui/material/List';
 import ListItem from '@mui/material/ListItem';
 import ListItemButton from '@mui/material/ListItemButton';
 import Tooltip from '@mui/material/Tooltip';
+import Button from '@mui/material/Button';
 import { gql, graphQLClient } from '~/graphql';
 import { Stack } from "@mui/material";
 
 const ConversationsQuery = gql`
-query GetConversations{
-    assistantConversations{
-        id
-        systemMessage
-        description
-        createdAt
-        previewText
+query GetConversations($after: String){
+    assistantConversationsPage(first: 50, after: $after){
+        results{
+            id
+            systemMessage
+            description
+            createdAt
+            previewText
+        }
+        pageInfo{
+            hasNextPage
+            endCursor
+        }
     }
 }
 `
 
 export async function loader({request, params}){
+    const searchParams = new URL(request.url).searchParams;
     const { data } = await graphQLClient.query({
-        query: ConversationsQuery
+        query: ConversationsQuery,
+        variables: {
+            after: searchParams.get('after')
+        }
     });
     return json(data);
 }
 
 export default function AssistantConversations(){
-    const { assistantConversations } = useLoaderData();
+    const { assistantConversationsPage } = useLoaderData();
+    const { results: assistantConversations, pageInfo } = assistantConversationsPage;
 
     return (
         <Page title="AI Conversations">
@@ -53,7 +65,7 @@ export default function AssistantConversations(){
                     </Grid>
                     <Divider />
                     <List>
-                        {assistantConversations.reverse().map(({id, previewText, createdAt, systemMessage}) => {
+                        {assistantConversations.map(({id, previewText, createdAt, systemMessage}) => {
                             return (
                                 <ListItemButton key={id}
                                                 divider={true}
@@ -81,6 +93,13 @@ export default function AssistantConversations(){
                             );
                         })}
                     </List>
+                    {pageInfo.hasNextPage && (
+                        <Stack direction="row" justifyContent="center" style={{padding: '10px'}}>
+                            <Button variant="outlined" component={Link} to={`?after=${encodeURIComponent(pageInfo.endCursor)}`}>
+                                Older conversations
+                            </Button>
+                        </Stack>
+                    )}
                 </Grid>
                 <Grid item xs={9}>
                     <Outlet />
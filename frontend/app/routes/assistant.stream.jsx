@@ -0,0 +1,21 @@
+// Proxies the backend's Server-Sent Events stream so the browser sees
+// assistant tokens as they are generated.
+export async function action({ request }) {
+  if (request.method !== "POST") {
+    throw new Response("Method not allowed", { status: 405 });
+  }
+
+  const upstream = await fetch(`${process.env.API_HOST}/assistant/stream`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: await request.text()
+  });
+
+  return new Response(upstream.body, {
+    status: upstream.status,
+    headers: {
+      "Content-Type": upstream.headers.get("Content-Type") || "text/plain",
+      "Cache-Control": "no-cache"
+    }
+  });
+}
@@ -6,7 +6,7 @@ import EditIcon from '@mui/icons-material/Edit';
 import HelpOutlineIcon from '@mui/icons-material/HelpOutline';
 
 import { useFormik } from 'formik';
-import { useState } from 'react';
+import { useEffect, useState } from 'react';
 
 import { json } from "@remix-run/node";
 import { gql, graphQLClient } from '~/graphql';
@@ -15,10 +15,14 @@ import { jsonToFormData, formDataToJson } from '~/utils/formUtils';
 
 const CopyEditMutation = gql`
 mutation CopyEdit($text: String!, $editorType: String){
-    copyEdit(text: $text, editorType: $editorType)
+    copyEditJob(text: $text, editorType: $editorType){
+        id
+    }
 }
 `
 
+const JOB_POLL_INTERVAL = 1000;
+
 export async function action({ request }){
     const formData = await request.formData();
     const { text, editorType } = formDataToJson(formData)
@@ -31,15 +35,25 @@ export async function action({ request }){
         }
     });
 
-    return json({ response: data.copyEdit });
+    return json({ jobId: data.copyEditJob.id });
 };
 
 export default function CopyEditor(){
     const [isEditing, setIsEditing] = useState(false)
     const fetcher = useFetcher();
-    
-    // Get the response from fetcher.data instead of actionData
-    const editedResponse = fetcher.data?.response;
+    const jobFetcher = useFetcher();
+
+    // The action queues a copy edit job, poll it until it finishes
+    const jobId = fetcher.data?.jobId;
+    const job = jobFetcher.data?.job;
+    const isDone = job?.id === jobId && ['succeeded', 'failed'].includes(job?.status);
+    const editedResponse = isDone ? (job.result?.text ?? '') : '';
+
+    useEffect(() => {
+        if (!jobId || isDone) return;
+        const poll = setInterval(() => jobFetcher.load(`/jobs/${jobId}`), JOB_POLL_INTERVAL);
+        return () => clearInterval(poll);
+    }, [jobId, isDone]);
 
     const formik = useFormik({
         initialValues: {
@@ -61,7 +75,7 @@ export default function CopyEditor(){
     }
     
     // Update loading state based on fetcher state
-    const isLoading = fetcher.state === "submitting" || fetcher.state === "loading";
+    const isLoading = fetcher.state === "submitting" || fetcher.state === "loading" || Boolean(jobId && !isDone);
 
     return (
         <Page title="Copy Editor">
@@ -145,7 +159,7 @@ export default function CopyEditor(){
                             InputProps={{
                                 readOnly: true,
                             }}
-                            placeholder="Edited text will appear here..."
+                            placeholder={job?.status === 'failed' ? "The edit failed, please try again." : "Edited text will appear here..."}
                             sx={{ mb: 2 }}
                         />
                         {editedResponse && (
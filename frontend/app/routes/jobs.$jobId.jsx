@@ -0,0 +1,25 @@
+import { json } from "@remix-run/node";
+import { gql, graphQLClient } from '~/graphql';
+
+const JobQuery = gql`
+query GetJob($jobId: ID!){
+    job(pk: $jobId){
+        id
+        kind
+        status
+        result
+        error
+    }
+}
+`
+
+// Polled by pages waiting on a background job
+export async function loader({ params }){
+    const { data } = await graphQLClient.query({
+        query: JobQuery,
+        variables: {
+            jobId: params.jobId
+        }
+    });
+    return json(data);
+}
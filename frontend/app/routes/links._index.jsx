@@ -1,9 +1,9 @@
 import { useState, useEffect, memo } from 'react';
 import useDebounce from '~/utils/debounce';
-import { Link as RouterLink, useLoaderData, useFetcher } from '@remix-run/react';
+import { Link as RouterLink, useLoaderData, useFetcher, useNavigate } from '@remix-run/react';
 import { json } from '@remix-run/node';
 // material
-import { Grid, Button, Container, Stack, Typography } from '@mui/material';
+import { Grid, Button, Chip, Container, Stack, Typography } from '@mui/material';
 // components
 import Page from '~/components/Page';
 import { LinkCard, LinksSort } from '~/components/link';
@@ -13,25 +13,36 @@ import CircularProgress from '@mui/material/CircularProgress';
 import { graphQLClient, gql } from '~/graphql';
 
 const query = gql`
-  query GetLinks {
-    links(order: {
-      createdAt: DESC
-    }) {
-      id
-      title
-      url
-      tags
-      clickCount
-      createdAt
+  query GetLinks($after: String, $filters: LinkFilter) {
+    linksPage(first: 48, after: $after, filters: $filters) {
+      totalCount
+      pageInfo {
+        hasNextPage
+        endCursor
+      }
+      results {
+        id
+        title
+        url
+        tags
+        clickCount
+        createdAt
+      }
     }
     tags
   }
 `;
 export async function loader({ request, params }){
+    const searchParams = new URL(request.url).searchParams;
+    const tag = searchParams.get('tag');
     const { data } = await graphQLClient.query({
         query,
+        variables: {
+            after: searchParams.get('after'),
+            filters: tag ? { tagsContains: [tag] } : null
+        }
     });
-    return json({ ...data });
+    return json({ ...data, tag });
 }
 
 export const meta = () => {
@@ -47,8 +58,14 @@ const LinkList = memo(function LinkList({links}){
 })
 
 export default function Links(){
-  const { links } = useLoaderData();
+  const { linksPage, tag } = useLoaderData();
+  const links = linksPage.results;
+  const nextPage = new URLSearchParams({
+    ...(tag ? { tag } : {}),
+    after: linksPage.pageInfo.endCursor || ''
+  });
   const [searchQuery, setSearchQuery] = useState('');
+  const navigate = useNavigate();
 
   const linkSearch = useFetcher();
 
@@ -81,6 +98,9 @@ export default function Links(){
 
         <Stack mb={5} direction="row" alignItems="center" justifyContent="space-between">
           <SearchBar placeholder="Search links..." setSearchQuery={searchLinks}/>
+          {tag && (
+            <Chip label={`#${tag}`} component={RouterLink} to="/links" onDelete={() => navigate('/links')} clickable />
+          )}
           {/* <LinksSort options={[]} /> */}
         </Stack>
 
@@ -90,12 +110,20 @@ export default function Links(){
               if(linkSearch.state == "submitting")
                 return <CircularProgress />
               if(linkSearch.state == "idle" && linkSearch.data && isSearching)
-                return <LinkList links={linkSearch.data.search} />
+                return <LinkList links={linkSearch.data.search.results} />
               return <LinkList links={links} />
 
             })()
           }
         </Grid>
+
+        {!isSearching && linksPage.pageInfo.hasNextPage && (
+          <Stack mt={5} direction="row" justifyContent="center">
+            <Button variant="outlined" component={RouterLink} to={`/links?${nextPage}`}>
+              Next page
+            </Button>
+          </Stack>
+        )}
       </Container>
     </Page>
   );
@@ -4,14 +4,17 @@ import { json } from "@remix-run/node";
 const SearchLinks = gql`
 query SearchLinks($query: String!){
     search(query: $query, type: "link", order: { field: "created_at", direction: "desc" }){
-        __typename
-        ... on Link {
-            id
-            title
-            url
-            tags
-            clickCount
-            createdAt
+        totalCount
+        results {
+            __typename
+            ... on Link {
+                id
+                title
+                url
+                tags
+                clickCount
+                createdAt
+            }
         }
     }
 }
@@ -144,7 +144,7 @@ export default function People() {
     });
   }, 500);
 
-  const peopleList = (searchQuery && peopleSearch.state === "idle" && peopleSearch.data) ? peopleSearch.data.search : people;
+  const peopleList = (searchQuery && peopleSearch.state === "idle" && peopleSearch.data) ? peopleSearch.data.search.results : people;
 
   return (
     <Page title="People">
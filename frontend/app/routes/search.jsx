@@ -4,22 +4,25 @@ import { json } from "@remix-run/node";
 const Search = gql`
 query Search($query: String!, $type: String!){
     search(query: $query, type: $type){
-        __typename
-        ... on Link {
-            id
-            title
-            url
-            tags
-        }
-        ... on Person {
-            id
-            name
-            team
-            role
-            logs(pagination: { offset: 0, limit: 1 }, order: { date: DESC }){
+        totalCount
+        results {
+            __typename
+            ... on Link {
+                id
+                title
+                url
+                tags
+            }
+            ... on Person {
                 id
-                note
-                date
+                name
+                team
+                role
+                logs(pagination: { offset: 0, limit: 1 }, order: { date: DESC }){
+                    id
+                    note
+                    date
+                }
             }
         }
     }
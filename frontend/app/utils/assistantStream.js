@@ -0,0 +1,41 @@
+// Reads the assistant's Server-Sent Events stream, calling the matching
+// handler for each conversation, token and done event. An error event,
+// sent when the reply fails part way through, rejects with its message.
+export async function streamAssistant(body, handlers = {}){
+    const response = await fetch('/assistant/stream', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(body)
+    });
+    if (!response.ok) {
+        throw new Error(`Assistant stream failed: ${response.status}`);
+    }
+
+    const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+    let buffer = '';
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += value;
+
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) >= 0) {
+            const event = parseEvent(buffer.slice(0, boundary));
+            buffer = buffer.slice(boundary + 2);
+            if (event.name === 'error') {
+                throw new Error(event.data?.message || 'Assistant stream failed');
+            }
+            handlers[event.name]?.(event.data);
+        }
+    }
+}
+
+function parseEvent(raw){
+    let name = 'message';
+    let data = '';
+    for (const line of raw.split('\n')) {
+        if (line.startsWith('event: ')) name = line.slice(7);
+        else if (line.startsWith('data: ')) data += line.slice(6);
+    }
+    return { name, data: data ? JSON.parse(data) : null };
+}